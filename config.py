@@ -1,50 +1,170 @@
 # === File: config.py ===
 
 import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
 from dotenv import load_dotenv
 
-# Carga las variables de entorno desde el archivo .env
-load_dotenv()
 
-# --- Credenciales de Facebook ---
-FB_APP_ID = os.getenv('FB_APP_ID')
-FB_APP_SECRET = os.getenv('FB_APP_SECRET')
-FB_ACCESS_TOKEN = os.getenv('FB_ACCESS_TOKEN')
-FB_AD_ACCOUNT_ID = os.getenv('FB_AD_ACCOUNT_ID')
+@dataclass(frozen=True, slots=True)
+class Settings:
+    """
+    Immutable application settings loaded once from the environment.
+    Frozen + slots keeps attribute access cheap and prevents accidental mutation.
+    """
+    # --- Credenciales de Facebook ---
+    FB_APP_ID: Optional[str]
+    FB_APP_SECRET: Optional[str]
+    FB_ACCESS_TOKEN: Optional[str]
+    FB_AD_ACCOUNT_ID: Optional[str]
+
+    # --- Credenciales de Azure OpenAI ---
+    AZURE_OPENAI_BASE_ENDPOINT: Optional[str]
+    AZURE_OPENAI_ENDPOINT: Optional[str]
+    AZURE_OPENAI_API_KEY: Optional[str]
+    AZURE_INFERENCE_CREDENTIAL: Optional[str]
+    AZURE_OPENAI_DEPLOYMENT_NAME: Optional[str]
+    AZURE_API_VERSION: str
+
+    # --- Credenciales de PostgreSQL ---
+    DATABASE_CONNECTION_STRING: Optional[str]
+
+    # --- Redis Configuration ---
+    REDIS_URL: Optional[str]
+
+    # --- Application Configuration ---
+    DEBUG: bool
+    RATE_LIMIT_ENABLED: bool
+
+    # --- Authentication Configuration ---
+    JWT_SECRET_KEY: Optional[str]
+    JWT_EXPIRATION_SECONDS: int
+    AUTH_REQUIRED: bool
+
+    # --- Logging Configuration ---
+    LOG_LEVEL: str
+    LOG_FILE: str
+    LOG_FORMAT: str
+    TRACE_SAMPLE_RATE: float
+
+    # --- LangChain and Agent Configuration ---
+    MEMORY_TEMPERATURE: float
+    MEMORY_MAX_TOKEN_LIMIT: int
+    AGENT_TEMPERATURE: float
+    AGENT_MAX_TOKENS: int
+    AGENT_MAX_ITERATIONS: int
+    CACHE_EXPIRATION_HOURS: int
 
+    # --- Prompts Configuration ---
+    SYSTEM_PROMPT_SOURCE: str
+    DEFAULT_PROMPT_FILE: str
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """
+    Build the application settings exactly once per process.
+    The .env file is parsed on the first call only; subsequent calls
+    (including uvicorn --reload reimports and test runs) hit the cache.
+    """
+    # Carga las variables de entorno desde el archivo .env
+    load_dotenv()
+
+    return Settings(
+        # --- Credenciales de Facebook ---
+        FB_APP_ID=os.getenv('FB_APP_ID'),
+        FB_APP_SECRET=os.getenv('FB_APP_SECRET'),
+        FB_ACCESS_TOKEN=os.getenv('FB_ACCESS_TOKEN'),
+        FB_AD_ACCOUNT_ID=os.getenv('FB_AD_ACCOUNT_ID'),
+        # --- Credenciales de Azure OpenAI ---
+        # Base endpoint (without /openai/deployments/ path)
+        AZURE_OPENAI_BASE_ENDPOINT=os.getenv("AZURE_OPENAI_ENDPOINT"),
+        # Full endpoint with deployment path (constructed automatically)
+        AZURE_OPENAI_ENDPOINT=os.getenv("AZURE_OPENAI_ENDPOINT"),
+        AZURE_OPENAI_API_KEY=os.getenv("AZURE_OPENAI_API_KEY"),  # Keep for backward compatibility
+        AZURE_INFERENCE_CREDENTIAL=os.getenv("AZURE_INFERENCE_CREDENTIAL"),  # New credential for LangChain
+        AZURE_OPENAI_DEPLOYMENT_NAME=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"),
+        AZURE_API_VERSION="2024-12-01-preview",
+        # --- Credenciales de PostgreSQL ---
+        DATABASE_CONNECTION_STRING=os.getenv('DATABASE_CONNECTION_STRING'),
+        # --- Redis Configuration ---
+        REDIS_URL=os.getenv('REDIS_URL'),
+        # --- Application Configuration ---
+        DEBUG=os.getenv('DEBUG', 'False').lower() == 'true',
+        RATE_LIMIT_ENABLED=os.getenv('RATE_LIMIT_ENABLED', 'True').lower() == 'true',
+        # --- Authentication Configuration ---
+        JWT_SECRET_KEY=os.getenv('JWT_SECRET_KEY'),
+        JWT_EXPIRATION_SECONDS=int(os.getenv('JWT_EXPIRATION_SECONDS', '3600')),
+        # Off by default until every client sends tokens; when off,
+        # presented tokens are still validated but absent ones pass
+        AUTH_REQUIRED=os.getenv('AUTH_REQUIRED', 'False').lower() == 'true',
+        # --- Logging Configuration ---
+        LOG_LEVEL=os.getenv('LOG_LEVEL', 'INFO'),
+        LOG_FILE=os.getenv('LOG_FILE', 'logs/app.log'),
+        LOG_FORMAT=os.getenv('LOG_FORMAT', '%(asctime)s - %(name)s - %(levelname)s - %(message)s'),
+        TRACE_SAMPLE_RATE=float(os.getenv('TRACE_SAMPLE_RATE', '0.01')),
+        # --- LangChain and Agent Configuration ---
+        # Memory configuration
+        MEMORY_TEMPERATURE=float(os.getenv('MEMORY_TEMPERATURE', '0.1')),
+        MEMORY_MAX_TOKEN_LIMIT=int(os.getenv('MEMORY_MAX_TOKEN_LIMIT', '2000')),
+        # Agent configuration
+        AGENT_TEMPERATURE=float(os.getenv('AGENT_TEMPERATURE', '0.7')),
+        AGENT_MAX_TOKENS=int(os.getenv('AGENT_MAX_TOKENS', '2000')),
+        AGENT_MAX_ITERATIONS=int(os.getenv('AGENT_MAX_ITERATIONS', '5')),
+        # Cache configuration
+        CACHE_EXPIRATION_HOURS=int(os.getenv('CACHE_EXPIRATION_HOURS', '1')),
+        # --- Prompts Configuration ---
+        SYSTEM_PROMPT_SOURCE=os.getenv('SYSTEM_PROMPT_SOURCE', 'database'),  # 'default' or 'database'
+        DEFAULT_PROMPT_FILE=os.getenv('DEFAULT_PROMPT_FILE', 'src/prompts/default_system_prompt.txt'),
+    )
+
+
+# Module-level aliases kept for backward compatibility with existing
+# `from config import X` call sites. They resolve from the cached settings,
+# so the .env file is still parsed exactly once.
+_settings = get_settings()
+
+# --- Credenciales de Facebook ---
+FB_APP_ID = _settings.FB_APP_ID
+FB_APP_SECRET = _settings.FB_APP_SECRET
+FB_ACCESS_TOKEN = _settings.FB_ACCESS_TOKEN
+FB_AD_ACCOUNT_ID = _settings.FB_AD_ACCOUNT_ID
 
 # --- Credenciales de Azure OpenAI ---
-# Base endpoint (without /openai/deployments/ path)
-AZURE_OPENAI_BASE_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
-# Full endpoint with deployment path (constructed automatically)
-AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
-AZURE_OPENAI_API_KEY = os.getenv("AZURE_OPENAI_API_KEY")  # Keep for backward compatibility
-AZURE_INFERENCE_CREDENTIAL = os.getenv("AZURE_INFERENCE_CREDENTIAL")  # New credential for LangChain
-AZURE_OPENAI_DEPLOYMENT_NAME = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
-AZURE_API_VERSION = "2024-12-01-preview"
+AZURE_OPENAI_BASE_ENDPOINT = _settings.AZURE_OPENAI_BASE_ENDPOINT
+AZURE_OPENAI_ENDPOINT = _settings.AZURE_OPENAI_ENDPOINT
+AZURE_OPENAI_API_KEY = _settings.AZURE_OPENAI_API_KEY
+AZURE_INFERENCE_CREDENTIAL = _settings.AZURE_INFERENCE_CREDENTIAL
+AZURE_OPENAI_DEPLOYMENT_NAME = _settings.AZURE_OPENAI_DEPLOYMENT_NAME
+AZURE_API_VERSION = _settings.AZURE_API_VERSION
 
 # --- Credenciales de PostgreSQL ---
-DATABASE_CONNECTION_STRING = os.getenv('DATABASE_CONNECTION_STRING')
+DATABASE_CONNECTION_STRING = _settings.DATABASE_CONNECTION_STRING
 
+# --- Redis Configuration ---
+REDIS_URL = _settings.REDIS_URL
 
 # --- Application Configuration ---
-DEBUG = os.getenv('DEBUG', 'False').lower() == 'true'
+DEBUG = _settings.DEBUG
+RATE_LIMIT_ENABLED = _settings.RATE_LIMIT_ENABLED
+# --- Authentication Configuration ---
+JWT_SECRET_KEY = _settings.JWT_SECRET_KEY
+JWT_EXPIRATION_SECONDS = _settings.JWT_EXPIRATION_SECONDS
+AUTH_REQUIRED = _settings.AUTH_REQUIRED
 # --- Logging Configuration ---
-LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
-LOG_FILE = os.getenv('LOG_FILE', 'logs/app.log')
-LOG_FORMAT = os.getenv('LOG_FORMAT', '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-
+LOG_LEVEL = _settings.LOG_LEVEL
+LOG_FILE = _settings.LOG_FILE
+LOG_FORMAT = _settings.LOG_FORMAT
+TRACE_SAMPLE_RATE = _settings.TRACE_SAMPLE_RATE
 
 # --- LangChain and Agent Configuration ---
-# Memory configuration
-MEMORY_TEMPERATURE = float(os.getenv('MEMORY_TEMPERATURE', '0.1'))
-MEMORY_MAX_TOKEN_LIMIT = int(os.getenv('MEMORY_MAX_TOKEN_LIMIT', '2000'))
-# Agent configuration  
-AGENT_TEMPERATURE = float(os.getenv('AGENT_TEMPERATURE', '0.7'))
-AGENT_MAX_TOKENS = int(os.getenv('AGENT_MAX_TOKENS', '2000'))
-AGENT_MAX_ITERATIONS = int(os.getenv('AGENT_MAX_ITERATIONS', '5'))
-# Cache configuration
-CACHE_EXPIRATION_HOURS = int(os.getenv('CACHE_EXPIRATION_HOURS', '1'))
+MEMORY_TEMPERATURE = _settings.MEMORY_TEMPERATURE
+MEMORY_MAX_TOKEN_LIMIT = _settings.MEMORY_MAX_TOKEN_LIMIT
+AGENT_TEMPERATURE = _settings.AGENT_TEMPERATURE
+AGENT_MAX_TOKENS = _settings.AGENT_MAX_TOKENS
+AGENT_MAX_ITERATIONS = _settings.AGENT_MAX_ITERATIONS
+CACHE_EXPIRATION_HOURS = _settings.CACHE_EXPIRATION_HOURS
 # --- Prompts Configuration ---
-SYSTEM_PROMPT_SOURCE = os.getenv('SYSTEM_PROMPT_SOURCE', 'database')  # 'default' or 'database'
-DEFAULT_PROMPT_FILE = os.getenv('DEFAULT_PROMPT_FILE', 'src/prompts/default_system_prompt.txt')
\ No newline at end of file
+SYSTEM_PROMPT_SOURCE = _settings.SYSTEM_PROMPT_SOURCE
+DEFAULT_PROMPT_FILE = _settings.DEFAULT_PROMPT_FILE
@@ -1,22 +1,36 @@
 # === File: main.py ===
 
+import asyncio
+import os
+import re
+import time
+from typing import Optional
+
 from fastapi import FastAPI, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy import select, text
 from sqlalchemy.orm import Session
+from cachetools import TTLCache
+import jwt
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
-from src.database import get_db, test_connection
+from src.database import get_db, check_connection
 from src.schemas import (
     HealthResponse, ChatRequest, ChatResponse, SessionInfoResponse, 
     ClearSessionRequest, ClearSessionResponse, ErrorResponse,
     LoginRequest, LoginResponse, UserResponse
 )
 from src.models import User
-from src.agent.agent_executor import DigitalMarketingAgent
-from config import DEBUG
+from config import get_settings
 from src.logging_config import setup_logging, get_logger
 
+# Load application settings (cached, parsed once per process)
+settings = get_settings()
+
 # Setup logging
 setup_logging()
 logger = get_logger(__name__)
@@ -26,14 +40,125 @@ app = FastAPI(
     title="Digital Marketing Analysis Agent",
     description="AI-powered backend for Facebook Ads performance analysis using LangChain",
     version="1.0.0",
-    debug=DEBUG
+    debug=settings.DEBUG,
+    default_response_class=ORJSONResponse  # Rust JSON encoder, emits bytes directly
 )
 
-# Setup rate limiting
-limiter = Limiter(key_func=get_remote_address)
-# Add rate limiting to the app
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+# Per-endpoint rate limits. slowapi parses these strings once, at decoration
+# time, so defining them as constants keeps the parsed limits shared and the
+# numbers reviewable in one place.
+RATE_LIMIT_HEALTH = "30/minute"
+RATE_LIMIT_LOGIN = "10/minute"
+RATE_LIMIT_VERIFY = "20/minute"
+RATE_LIMIT_CHAT = "20/minute"
+RATE_LIMIT_SESSION_INFO = "30/minute"
+RATE_LIMIT_SESSION_CLEAR = "10/minute"
+RATE_LIMIT_CLEAR_ALL = "5/minute"
+
+# Setup rate limiting (feature-flagged so single-user/dev deployments can
+# skip the per-request limiter overhead entirely)
+if settings.RATE_LIMIT_ENABLED:
+    if settings.REDIS_URL:
+        # Redis-backed fixed-window counters: shared across uvicorn workers
+        # and O(1) INCR+EXPIRE per request, instead of a per-process dict
+        # guarded by a contended lock
+        limiter = Limiter(
+            key_func=get_remote_address,
+            storage_uri=settings.REDIS_URL,
+            strategy="fixed-window"
+        )
+    else:
+        limiter = Limiter(key_func=get_remote_address, strategy="fixed-window")
+    # Add rate limiting to the app
+    app.state.limiter = limiter
+    app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+else:
+    class _NoOpLimiter:
+        """Drop-in replacement for slowapi's Limiter when rate limiting is disabled."""
+        def limit(self, _limit_value):
+            def decorator(func):
+                return func
+            return decorator
+
+    limiter = _NoOpLimiter()
+
+# Signing key for access tokens, loaded once at import time
+_JWT_KEY = settings.JWT_SECRET_KEY.encode() if settings.JWT_SECRET_KEY else None
+_JWT_ALGORITHM = "HS256"
+
+def _create_access_token(user: User) -> str:
+    """
+    Create a signed, stateless access token for a user.
+    Falls back to the legacy MVP token when no signing key is configured.
+    """
+    if _JWT_KEY is None:
+        logger.warning("JWT_SECRET_KEY not configured, issuing legacy unsigned token")
+        return f"user_{user.id}_{user.email}"
+    return jwt.encode(
+        {
+            "sub": str(user.id),
+            "email": user.email,
+            "exp": int(time.time()) + settings.JWT_EXPIRATION_SECONDS
+        },
+        _JWT_KEY,
+        algorithm=_JWT_ALGORITHM
+    )
+
+def decode_access_token(token: str) -> dict:
+    """
+    Validate a signed access token locally (no database round-trip).
+
+    Raises:
+        HTTPException: 401 if the token is invalid or expired
+    """
+    if _JWT_KEY is None:
+        raise HTTPException(
+            status_code=401,
+            detail="Token validation is not configured"
+        )
+    try:
+        return jwt.decode(token, _JWT_KEY, algorithms=[_JWT_ALGORITHM])
+    except jwt.InvalidTokenError as e:
+        raise HTTPException(
+            status_code=401,
+            detail=f"Invalid access token: {str(e)}"
+        )
+
+_bearer_scheme = HTTPBearer(auto_error=False)
+
+async def get_current_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(_bearer_scheme)
+) -> Optional[dict]:
+    """
+    Resolve the caller from the Authorization header by validating the
+    token locally — no /auth/verify database round-trip per request.
+    Presented tokens are always validated; missing ones are only
+    rejected when AUTH_REQUIRED is on, so existing clients keep working
+    until the token rollout completes.
+    """
+    if credentials is not None:
+        return decode_access_token(credentials.credentials)
+    if settings.AUTH_REQUIRED:
+        raise HTTPException(
+            status_code=401,
+            detail="Not authenticated"
+        )
+    return None
+
+# Static root payload, built once at import time
+_ROOT_RESPONSE = {
+    "message": "Digital Marketing Analysis Agent API",
+    "version": "1.0.0",
+    "status": "running",
+    "docs": "/docs"
+}
+
+# Short-TTL cache so load-balancer probe bursts collapse into one DB probe
+_health_cache = TTLCache(maxsize=1, ttl=1.0)
+
+# Reusable health-check query; building the TextClause once lets the
+# driver reuse its prepared statement across probes
+_HEALTH_CHECK_QUERY = text("SELECT 1")
 
 # Configure CORS
 app.add_middleware(
@@ -49,30 +174,32 @@ async def root():
     """
     Root endpoint with basic API information.
     """
-    return {
-        "message": "Digital Marketing Analysis Agent API",
-        "version": "1.0.0",
-        "status": "running",
-        "docs": "/docs"
-    }
+    return _ROOT_RESPONSE
 
 @app.get("/health", response_model=HealthResponse)
-@limiter.limit("30/minute")  # 30 health checks per minute
+@limiter.limit(RATE_LIMIT_HEALTH)
 async def health_check(request: Request):
     """
     Health check endpoint to verify service and database status.
     Returns service status and database connection status.
     """
     try:
-        # Test database connection
-        db_connected = test_connection()
+        # Serve a recent result if one is cached (probe storms hit this)
+        cached = _health_cache.get('response')
+        if cached is not None:
+            return cached
         
-        return HealthResponse(
+        # Test database connection off the event loop
+        db_connected = await run_in_threadpool(check_connection)
+        
+        response = HealthResponse(
             status="ok" if db_connected else "degraded",
             database_connected=db_connected
         )
+        _health_cache['response'] = response
+        return response
     except Exception as e:
-        logger.error(f"Health check failed: {e}")
+        logger.error("Health check failed: %s", e)
         raise HTTPException(
             status_code=503,
             detail=f"Service unhealthy: {str(e)}"
@@ -86,8 +213,8 @@ async def database_health_check(db: Session = Depends(get_db)):
     """
     try:
         # Test basic database operation
-        result = db.execute("SELECT 1 as test")
-        test_value = result.scalar()
+        result = db.execute(_HEALTH_CHECK_QUERY)
+        test_value = result.scalar_one()
         
         if test_value == 1:
             return {
@@ -101,7 +228,7 @@ async def database_health_check(db: Session = Depends(get_db)):
                 detail="Database test query failed"
             )
     except Exception as e:
-        logger.error(f"Database health check failed: {e}")
+        logger.error("Database health check failed: %s", e)
         raise HTTPException(
             status_code=503,
             detail=f"Database unhealthy: {str(e)}"
@@ -110,39 +237,42 @@ async def database_health_check(db: Session = Depends(get_db)):
 # === Authentication Endpoints ===
 
 @app.post("/auth/login", response_model=LoginResponse)
-@limiter.limit("10/minute")  # 10 login attempts per minute
+@limiter.limit(RATE_LIMIT_LOGIN)
 async def login(request: Request, login_data: LoginRequest, db: Session = Depends(get_db)):
     """
     Simple login endpoint that verifies if email exists in users table.
     For MVP: only checks if email exists, no password validation yet.
     """
     try:
-        logger.info(f"Login attempt for email: {login_data.email}")
+        logger.info("Login attempt for email: %s", login_data.email)
         
         # Check if user exists in database
-        user = db.query(User).filter(
-            User.email == login_data.email,
-            User.is_active == True
-        ).first()
+        user = db.execute(
+            select(User).where(
+                User.email == login_data.email,
+                User.is_active.is_(True)
+            )
+        ).scalar_one_or_none()
         
         if user:
-            logger.info(f"Successful login for user: {user.email}")
-            return LoginResponse(
+            logger.info("Successful login for user: %s", user.email)
+            # model_construct skips re-validation; the fields come straight
+            # from a freshly loaded DB row, so they're already well-typed
+            return LoginResponse.model_construct(
                 success=True,
                 message="Login successful",
-                user=UserResponse(
+                user=UserResponse.model_construct(
                     id=user.id,
                     email=user.email,
                     name=user.name,
-                    password=None,  # Never return password
                     is_active=user.is_active,
                     created_at=user.created_at,
                     updated_at=user.updated_at
                 ),
-                access_token=f"user_{user.id}_{user.email}"  # Simple token for MVP
+                access_token=_create_access_token(user)
             )
         else:
-            logger.warning(f"Login failed - user not found: {login_data.email}")
+            logger.warning("Login failed - user not found: %s", login_data.email)
             return LoginResponse(
                 success=False,
                 message="User not found or inactive",
@@ -151,24 +281,26 @@ async def login(request: Request, login_data: LoginRequest, db: Session = Depend
             )
             
     except Exception as e:
-        logger.error(f"Login error: {e}")
+        logger.error("Login error: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Login failed: {str(e)}"
         )
 
 @app.get("/auth/verify/{email}")
-@limiter.limit("20/minute")  # 20 verification attempts per minute
+@limiter.limit(RATE_LIMIT_VERIFY)
 async def verify_user(request: Request, email: str, db: Session = Depends(get_db)):
     """
     Verify if a user email exists in the system.
     Useful for frontend to check if user can login.
     """
     try:
-        user = db.query(User).filter(
-            User.email == email,
-            User.is_active == True
-        ).first()
+        user = db.execute(
+            select(User).where(
+                User.email == email,
+                User.is_active.is_(True)
+            )
+        ).scalar_one_or_none()
         
         return {
             "email": email,
@@ -177,32 +309,174 @@ async def verify_user(request: Request, email: str, db: Session = Depends(get_db
         }
         
     except Exception as e:
-        logger.error(f"User verification error: {e}")
+        logger.error("User verification error: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Verification failed: {str(e)}"
         )
 
+# === Chat Micro-Batching ===
+
+class ChatBatcher:
+    """
+    Adaptive micro-batcher for /chat requests.
+
+    Concurrent chat requests are coalesced into small batches and dispatched
+    together, so bursts share one scheduling pass instead of each request
+    paying its own. The collection window adapts to load: it grows while
+    requests queue faster than they drain and shrinks when traffic is light,
+    keeping tail latency bounded under low load.
+    """
+
+    def __init__(self, max_batch: int = 8, min_wait_ms: float = 2.0, max_wait_ms: float = 25.0):
+        self.max_batch = max_batch
+        self._min_wait = min_wait_ms / 1000.0
+        self._max_wait = max_wait_ms / 1000.0
+        self._wait = self._min_wait
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._drain_task = None
+        self._dispatch_tasks: set = set()
+
+    def start(self) -> None:
+        """Start the background drain task (called on app startup)."""
+        if self._drain_task is None:
+            self._drain_task = asyncio.get_running_loop().create_task(self._drain())
+
+    async def stop(self) -> None:
+        """Cancel the background drain task (called on app shutdown)."""
+        if self._drain_task is not None:
+            self._drain_task.cancel()
+            self._drain_task = None
+
+    async def submit(self, agent, message: str) -> str:
+        """Queue a message for batched processing and wait for its response."""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((agent, message, future))
+        return await future
+
+    async def _drain(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            # Block for the first item, then collect more within the window
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self._wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Adapt the window: widen while saturated, narrow when light
+            if len(batch) >= self.max_batch or not self._queue.empty():
+                self._wait = min(self._max_wait, self._wait * 2)
+            else:
+                self._wait = max(self._min_wait, self._wait / 2)
+
+            # Dispatch in the background so collection keeps going while
+            # earlier batches are still executing; otherwise one slow LLM
+            # call would head-of-line block every later request into
+            # lock-step waves. The loop only keeps weak references to
+            # tasks, so hold one here until the dispatch finishes.
+            task = asyncio.create_task(self._dispatch(batch))
+            self._dispatch_tasks.add(task)
+            task.add_done_callback(self._dispatch_tasks.discard)
+
+    async def _dispatch(self, batch: list) -> None:
+        results = await asyncio.gather(
+            *[run_in_threadpool(agent.process_message, message)
+              for agent, message, _ in batch],
+            return_exceptions=True
+        )
+        for (_, _, future), result in zip(batch, results):
+            if future.cancelled():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+chat_batcher = ChatBatcher()
+
+@app.on_event("startup")
+async def _start_chat_batcher():
+    chat_batcher.start()
+
+@app.on_event("shutdown")
+async def _stop_chat_batcher():
+    await chat_batcher.stop()
+
+# === Session Helpers ===
+
+# Session IDs look like "<prefix>_<encoded user id>"; the encoded part uses
+# "_at_" for "@" and "_" for "." so it stays filename-safe.
+_SESSION_ID_RE = re.compile(r"^[^_]+_(.+)$")
+
+def _user_id_from_session_id(session_id: str) -> str:
+    """
+    Extract the user ID encoded in a session ID.
+
+    Raises:
+        HTTPException: 400 if the session ID doesn't match the expected format
+    """
+    match = _SESSION_ID_RE.match(session_id)
+    if not match:
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid session ID format"
+        )
+    return match.group(1).replace("_at_", "@").replace("_", ".")
+
+# === Agent Pool ===
+
+# Constructing a DigitalMarketingAgent re-loads the system prompt, re-opens
+# LLM clients and re-hydrates memory from the database. The same session
+# always maps to the same agent, so instances are pooled per
+# (user_id, session_id) with a bounded TTL cache.
+def _get_agent(user_id, session_id=None):
+    """
+    Get a pooled DigitalMarketingAgent for the given user/session.
+    The pool itself lives next to the agent class so non-HTTP callers
+    (batch processing) share the same instances.
+    """
+    # Lazy import: keeps LangChain/Azure/pandas out of the import graph
+    # for workers that only serve health/auth traffic
+    from src.agent.agent_executor import DigitalMarketingAgent
+
+    return DigitalMarketingAgent.get(user_id, session_id)
+
+def _evict_agent(user_id, session_id=None):
+    """
+    Remove a pooled agent (e.g. after its session is cleared).
+    """
+    from src.agent.agent_executor import DigitalMarketingAgent
+
+    DigitalMarketingAgent.evict(user_id, session_id)
+
 # === Chat Endpoints ===
 
 @app.post("/chat", response_model=ChatResponse)
-@limiter.limit("20/minute")  # 20 chat messages per minute
-async def chat_with_agent(request: Request, chat_request: ChatRequest):
+@limiter.limit(RATE_LIMIT_CHAT)
+async def chat_with_agent(
+    request: Request,
+    chat_request: ChatRequest,
+    current_user: Optional[dict] = Depends(get_current_user)
+):
     """
     Chat endpoint for conversation with the Digital Marketing Agent.
     Processes user messages and returns AI agent responses.
     """
     try:
-        logger.info(f"Chat request from user {chat_request.user_id}")
+        logger.info("Chat request from user %s", chat_request.user_id)
         
-        # Create or get agent instance
-        agent = DigitalMarketingAgent(
-            user_id=chat_request.user_id,
-            session_id=chat_request.session_id
-        )
+        # Create or get pooled agent instance
+        agent = _get_agent(chat_request.user_id, chat_request.session_id)
         
-        # Process message with agent
-        response_text = agent.process_message(chat_request.message)
+        # Process message through the micro-batcher, which coalesces
+        # concurrent chats and runs them off the event loop
+        response_text = await chat_batcher.submit(agent, chat_request.message)
         
         # Return response
         return ChatResponse(
@@ -212,35 +486,30 @@ async def chat_with_agent(request: Request, chat_request: ChatRequest):
         )
         
     except Exception as e:
-        logger.error(f"Error in chat endpoint: {e}")
+        logger.error("Error in chat endpoint: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Error processing chat request: {str(e)}"
         )
 
 @app.get("/chat/session/{session_id}", response_model=SessionInfoResponse)
-@limiter.limit("30/minute")  # 30 session info requests per minute
-async def get_session_info(request: Request, session_id: str):
+@limiter.limit(RATE_LIMIT_SESSION_INFO)
+async def get_session_info(
+    request: Request,
+    session_id: str,
+    current_user: Optional[dict] = Depends(get_current_user)
+):
     """
     Get information about a specific chat session.
     """
     try:
-        logger.info(f"Getting session info for {session_id}")
+        logger.info("Getting session info for %s", session_id)
         
         # Extract user_id from session_id (format: timestamp_userid)
-        if "_" in session_id:
-            user_id = "_".join(session_id.split("_")[1:]).replace("_at_", "@").replace("_", ".")
-        else:
-            raise HTTPException(
-                status_code=400,
-                detail="Invalid session ID format"
-            )
+        user_id = _user_id_from_session_id(session_id)
         
-        # Create agent to get session info
-        agent = DigitalMarketingAgent(
-            user_id=user_id,
-            session_id=session_id
-        )
+        # Get pooled agent for session info
+        agent = _get_agent(user_id, session_id)
         
         # Get session information
         session_info = agent.get_session_info()
@@ -255,36 +524,31 @@ async def get_session_info(request: Request, session_id: str):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error getting session info: {e}")
+        logger.error("Error getting session info: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Error retrieving session information: {str(e)}"
         )
 
 @app.delete("/chat/session/{session_id}", response_model=ClearSessionResponse)
-@limiter.limit("10/minute")  # 10 session clear requests per minute
-async def clear_session(request: Request, session_id: str):
+@limiter.limit(RATE_LIMIT_SESSION_CLEAR)
+async def clear_session(
+    request: Request,
+    session_id: str,
+    current_user: Optional[dict] = Depends(get_current_user)
+):
     """
     Clear a specific chat session.
     """
     try:
-        logger.info(f"Clearing session {session_id}")
+        logger.info("Clearing session %s", session_id)
         
         # Extract user_id from session_id
-        if "_" in session_id:
-            user_id = "_".join(session_id.split("_")[1:]).replace("_at_", "@").replace("_", ".")
-        else:
-            raise HTTPException(
-                status_code=400,
-                detail="Invalid session ID format"
-            )
-        
-        # Create agent and clear session
-        agent = DigitalMarketingAgent(
-            user_id=user_id,
-            session_id=session_id
-        )
+        user_id = _user_id_from_session_id(session_id)
         
+        # Get agent, drop it from the pool and clear its session
+        agent = _get_agent(user_id, session_id)
+        _evict_agent(user_id, session_id)
         agent.clear_session()
         
         return ClearSessionResponse(
@@ -296,27 +560,29 @@ async def clear_session(request: Request, session_id: str):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error clearing session: {e}")
+        logger.error("Error clearing session: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Error clearing session: {str(e)}"
         )
 
 @app.post("/chat/clear", response_model=ClearSessionResponse)
-@limiter.limit("5/minute")  # 5 clear all sessions requests per minute
-async def clear_user_sessions(request: Request, clear_request: ClearSessionRequest):
+@limiter.limit(RATE_LIMIT_CLEAR_ALL)
+async def clear_user_sessions(
+    request: Request,
+    clear_request: ClearSessionRequest,
+    current_user: Optional[dict] = Depends(get_current_user)
+):
     """
     Clear all sessions for a specific user or a specific session.
     """
     try:
-        logger.info(f"Clear sessions request for user {clear_request.user_id}")
+        logger.info("Clear sessions request for user %s", clear_request.user_id)
         
         if clear_request.session_id:
-            # Clear specific session
-            agent = DigitalMarketingAgent(
-                user_id=clear_request.user_id,
-                session_id=clear_request.session_id
-            )
+            # Clear specific session and drop it from the pool
+            agent = _get_agent(clear_request.user_id, clear_request.session_id)
+            _evict_agent(clear_request.user_id, clear_request.session_id)
             agent.clear_session()
             
             return ClearSessionResponse(
@@ -334,7 +600,7 @@ async def clear_user_sessions(request: Request, clear_request: ClearSessionReque
             )
         
     except Exception as e:
-        logger.error(f"Error clearing user sessions: {e}")
+        logger.error("Error clearing user sessions: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Error clearing sessions: {str(e)}"
@@ -350,6 +616,16 @@ if __name__ == "__main__":
         "main:app",
         host="0.0.0.0",
         port=8000,
-        reload=DEBUG,
-        log_level="info"
+        reload=settings.DEBUG,
+        log_level="info",
+        # uvloop + httptools (bundled with uvicorn[standard]) move event-loop
+        # dispatch and HTTP parsing into C
+        loop="uvloop",
+        http="httptools",
+        # reload mode only supports a single worker
+        workers=1 if settings.DEBUG else (os.cpu_count() or 1),
+        backlog=2048,
+        timeout_keep_alive=30,
+        # the app logger already emits structured request logs
+        access_log=settings.DEBUG
     )
\ No newline at end of file
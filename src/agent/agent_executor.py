@@ -1,21 +1,37 @@
 # === File: src/agent/agent_executor.py ===
 
+from functools import lru_cache
 from typing import List, Dict, Any, Optional
+
+import asyncio
+import os
+import random
+import re
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock, RLock
+
+import httpx
+import orjson
+from cachetools import LRUCache, TTLCache
 from langchain.agents import AgentExecutor, create_openai_tools_agent
+from langchain.callbacks.base import BaseCallbackHandler
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_openai import AzureChatOpenAI
-from sqlalchemy import and_
-from datetime import datetime, timedelta
+from sqlalchemy import select, text
 
 from src.agent.memory import DatabaseConversationMemory, create_memory
 from src.tools.facebook_tools import list_available_clients_tool, facebook_ads_analysis_tool
+from src.tools.memory_tools import previous_sessions_summary_tool
 from src.utils.cost_calculator import CostCalculator
-from src.database import get_db
+from src.database import session_scope
 from src.models import AnalysisResult, FacebookAccount
 from config import (
     AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_KEY, AZURE_OPENAI_DEPLOYMENT_NAME, AZURE_API_VERSION,
     AGENT_TEMPERATURE, AGENT_MAX_TOKENS, AGENT_MAX_ITERATIONS,
-    SYSTEM_PROMPT_SOURCE, DEFAULT_PROMPT_FILE
+    SYSTEM_PROMPT_SOURCE, DEFAULT_PROMPT_FILE, CACHE_EXPIRATION_HOURS, DEBUG,
+    TRACE_SAMPLE_RATE
 )
 from src.logging_config import get_logger
 
@@ -23,6 +39,345 @@ logger = get_logger(__name__)
 
 # === System Prompt Management ===
 
+# Prepared once at import; fetches only the two columns the loader needs
+_ACTIVE_PROMPT_QUERY = text(
+    "SELECT prompt_text, version FROM prompt_versions "
+    "WHERE prompt_name = :prompt_name AND is_active LIMIT 1"
+)
+
+# Base system prompts rarely change, so they are cached per-process instead
+# of re-reading the file / re-querying the database on every agent
+# construction. Keys are the prompt source: 'database' maps to an
+# (expires_at, text) pair — refreshed after the TTL or instantly via the
+# LISTEN thread below — and 'file' to an (mtime, text) pair so on-disk
+# edits are picked up.
+_prompt_cache: Dict[str, Any] = {}
+
+# Database prompts are re-read at most once per TTL window; a Postgres
+# NOTIFY on this channel drops the cache immediately, so updates
+# propagate without polling. Pair it with a trigger such as:
+#   CREATE TRIGGER prompt_version_changed AFTER INSERT OR UPDATE
+#   ON prompt_versions FOR EACH STATEMENT
+#   EXECUTE FUNCTION pg_notify_prompt_version_changed();
+_PROMPT_CACHE_TTL_SECONDS = 60
+_PROMPT_CHANGE_CHANNEL = "prompt_version_changed"
+_prompt_listener_lock = threading.Lock()
+_prompt_listener_started = False
+
+def _listen_for_prompt_changes() -> None:
+    """
+    Block on the Postgres notification channel and invalidate the prompt
+    cache whenever a prompt version changes. Runs on a daemon thread;
+    connection failures back off and reconnect.
+    """
+    import select as select_mod
+
+    from src.database import engine
+
+    while True:
+        try:
+            raw = engine.raw_connection()
+            try:
+                pg_conn = raw.driver_connection
+                with raw.cursor() as cur:
+                    cur.execute(f"LISTEN {_PROMPT_CHANGE_CHANNEL}")
+                raw.commit()
+                while True:
+                    if select_mod.select([pg_conn], [], [], 60.0) == ([], [], []):
+                        continue
+                    pg_conn.poll()
+                    if pg_conn.notifies:
+                        pg_conn.notifies.clear()
+                        logger.info("Prompt change notification received, invalidating cache")
+                        invalidate_prompt_cache()
+            finally:
+                raw.close()
+        except Exception as e:
+            logger.error("Prompt listener error (reconnecting in 5s): %s", e)
+            time.sleep(5)
+
+def _ensure_prompt_listener() -> None:
+    """
+    Start the LISTEN thread on first use; no-op on non-Postgres engines
+    (notifications are a Postgres feature) and on repeat calls.
+    """
+    global _prompt_listener_started
+    with _prompt_listener_lock:
+        if _prompt_listener_started:
+            return
+        _prompt_listener_started = True
+
+        from src.database import engine
+        if engine.dialect.name != 'postgresql':
+            return
+        threading.Thread(
+            target=_listen_for_prompt_changes, daemon=True, name="prompt-listener"
+        ).start()
+
+def invalidate_prompt_cache() -> None:
+    """
+    Clear the cached system prompts.
+    Call after an admin updates the prompt file or activates a new
+    prompt version in the database.
+    """
+    _prompt_cache.clear()
+    _agent_cache.clear()
+    _build_prompt_template.cache_clear()
+    logger.info("System prompt cache invalidated")
+
+# Compiled agents keyed by prompt text plus the LLM instance they were
+# bound to: create_openai_tools_agent closes over the LLM, so an agent
+# built against one client must not be reused with another (tests swap
+# the LLM per case). Bounded like the template cache below.
+_agent_cache: LRUCache = LRUCache(maxsize=8)
+
+@lru_cache(maxsize=8)
+def _build_prompt_template(system_prompt: str, personalization: str) -> ChatPromptTemplate:
+    """
+    Compile the chat prompt template for a system prompt once per process.
+    Cached separately from the agent so template compilation is shared
+    even when agents are rebuilt with a different LLM (e.g. in tests).
+
+    The base prompt and the per-user personalization are kept as two
+    separate system blocks: the first block is byte-identical for every
+    user, so the provider's prompt-prefix cache can hit on it across the
+    whole user base instead of being fragmented by the user name.
+    """
+    return ChatPromptTemplate.from_messages([
+        ("system", system_prompt),
+        ("system", personalization),
+        MessagesPlaceholder(variable_name="chat_history"),
+        ("human", "{input}"),
+        MessagesPlaceholder(variable_name="agent_scratchpad")
+    ])
+
+def _build_agent(system_prompt: str, personalization: str, llm, tools):
+    """
+    Return the compiled OpenAI tools agent for a system prompt,
+    building and caching it on first use.
+    """
+    key = (system_prompt, personalization, id(llm))
+    cached = _agent_cache.get(key)
+    # id() can be recycled after the original LLM is garbage-collected,
+    # so confirm the cached agent was built against this exact instance
+    if cached is not None and cached[0] is llm:
+        return cached[1]
+    prompt = _build_prompt_template(system_prompt, personalization)
+    agent = create_openai_tools_agent(llm=llm, tools=tools, prompt=prompt)
+    _agent_cache[key] = (llm, agent)
+    return agent
+
+class _ToolUsageRecorder(BaseCallbackHandler):
+    """
+    Records the most recent tool invocation of a run so tool usage can be
+    extracted without asking the executor to materialize the full
+    intermediate-steps list.
+    """
+    
+    def __init__(self):
+        self.last_tool: Optional[str] = None
+        self.last_tool_input: Dict[str, Any] = {}
+    
+    def reset(self) -> None:
+        self.last_tool = None
+        self.last_tool_input = {}
+    
+    def on_tool_start(self, serialized, input_str, **kwargs):
+        self.last_tool = (serialized or {}).get('name')
+        inputs = kwargs.get('inputs')
+        self.last_tool_input = inputs if isinstance(inputs, dict) else {}
+
+class SampledTraceHandler(BaseCallbackHandler):
+    """
+    Structured, sampled replacement for AgentExecutor's verbose mode.
+    verbose=True prints full prompt and step dumps to stdout on every
+    turn; this handler instead buffers a compact event list and emits a
+    single JSON log line at DEBUG for a sampled fraction of turns.
+    """
+
+    def __init__(self, sample_rate: float = TRACE_SAMPLE_RATE):
+        self._sample_rate = sample_rate
+        self._sampled = False
+        self._events: List[Dict[str, Any]] = []
+        self._turn_start = 0.0
+
+    def _record(self, event: str, **payload) -> None:
+        if self._sampled:
+            payload['event'] = event
+            payload['t_ms'] = round((time.monotonic() - self._turn_start) * 1000, 1)
+            self._events.append(payload)
+
+    def on_chain_start(self, serialized, inputs, *, parent_run_id=None, **kwargs):
+        # A top-level chain start marks the beginning of a turn; the
+        # sampling decision for the whole turn is made here
+        if parent_run_id is None:
+            self._sampled = random.random() < self._sample_rate
+            self._events = []
+            self._turn_start = time.monotonic()
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self._record('llm_start', prompt_chars=sum(len(p) for p in prompts))
+
+    def on_llm_end(self, response, **kwargs):
+        self._record('llm_end')
+
+    def on_tool_start(self, serialized, input_str, **kwargs):
+        self._record('tool_start', tool=(serialized or {}).get('name'))
+
+    def on_tool_end(self, output, **kwargs):
+        self._record('tool_end', output_chars=len(str(output)))
+
+    def on_chain_end(self, outputs, *, parent_run_id=None, **kwargs):
+        if parent_run_id is None and self._sampled:
+            logger.debug("agent trace: %s", orjson.dumps({
+                'duration_ms': round((time.monotonic() - self._turn_start) * 1000, 1),
+                'events': self._events
+            }).decode())
+            self._sampled = False
+            self._events = []
+
+# === Shared LLM Client ===
+
+@lru_cache(maxsize=1)
+def _get_shared_llm() -> AzureChatOpenAI:
+    """
+    Build the Azure OpenAI client once per process.
+    The client is stateless across conversations (temperature, deployment
+    and token limits come from config), so every agent instance can share
+    it and reuse the same underlying HTTP connection pool.
+    """
+    # Explicit keepalive pool so repeated completions reuse warm TLS
+    # sessions instead of paying a handshake per call
+    http_client = httpx.Client(
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=40),
+        timeout=httpx.Timeout(60.0, connect=10.0)
+    )
+    return AzureChatOpenAI(
+        azure_deployment=AZURE_OPENAI_DEPLOYMENT_NAME,  # Use deployment name
+        api_key=AZURE_OPENAI_API_KEY,
+        azure_endpoint=AZURE_OPENAI_ENDPOINT,
+        api_version=AZURE_API_VERSION,
+        temperature=AGENT_TEMPERATURE,  # Configurable temperature for balanced creativity
+        max_tokens=AGENT_MAX_TOKENS,
+        model=AZURE_OPENAI_DEPLOYMENT_NAME,  # Required for token counting
+        http_client=http_client
+    )
+
+# Ad-account ids recur across sessions and users, and the mapping to the
+# internal facebook_accounts primary key is stable, so resolved ids are
+# memoized process-wide. Only hits are stored: a miss may mean the
+# account simply hasn't been registered yet.
+_fb_account_id_cache: Dict[str, int] = {}
+
+# Analysis results are bookkeeping the caller never waits on; their DB
+# writes run on this small worker pool off the response path
+_save_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="analysis-save")
+
+# Facebook ad account ids look like act_<digits>; compiled once at import
+_ACCOUNT_RE = re.compile(r'act_(\d+)')
+
+def _resolve_facebook_account_id(db, ad_account_id: str) -> Optional[int]:
+    """
+    Map an ad account id (act_...) to the facebook_accounts primary key,
+    using a scalar select and a process-wide cache of known accounts.
+    """
+    cached = _fb_account_id_cache.get(ad_account_id)
+    if cached is not None:
+        return cached
+    
+    account_id = db.execute(
+        select(FacebookAccount.id).where(FacebookAccount.ad_account_id == ad_account_id)
+    ).scalar_one_or_none()
+    if account_id is not None:
+        _fb_account_id_cache[ad_account_id] = account_id
+    return account_id
+
+# Resolved display names, memoized process-wide. Like the account-id
+# cache above, only hits are stored: the "Usuario" fallback for a
+# missing name or a transient DB error must not get pinned for the life
+# of the process.
+_user_name_cache: Dict[int, str] = {}
+
+def _fetch_user_name(user_id: int) -> str:
+    """
+    Look up a user's display name, memoized process-wide.
+    Names are nearly immutable, so each user costs one round-trip per
+    process instead of one per agent construction.
+    """
+    cached = _user_name_cache.get(user_id)
+    if cached is not None:
+        return cached
+    try:
+        from src.database import session_scope
+        from src.models import User
+
+        with session_scope() as db:
+            # Scalar select: only the name column, no row-object hydration
+            name = db.execute(
+                select(User.name).where(User.id == user_id)
+            ).scalar_one_or_none()
+            if name:
+                _user_name_cache[user_id] = name
+                return name
+        return "Usuario"
+
+    except Exception as e:
+        logger.error("Error getting user name: %s", e)
+        return "Usuario"
+
+def clear_user_name_cache() -> None:
+    """
+    Drop all memoized user names (call after profile edits).
+    """
+    _user_name_cache.clear()
+
+# Response cache for near-duplicate questions. Repeat questions (users
+# re-asking the same thing within a few minutes) skip the LLM round-trip
+# entirely. Keys are (user_id, whitespace/case-normalized message);
+# messages containing digits are never cached since those are usually
+# date- or metric-specific and must stay fresh.
+_response_cache = TTLCache(maxsize=2048, ttl=900)
+_DIGIT_RE = re.compile(r'\d')
+
+def _response_cache_key(user_id: int, message: str) -> tuple:
+    return (user_id, ' '.join(message.lower().split()))
+
+def _is_cacheable_message(message: str) -> bool:
+    return not _DIGIT_RE.search(message)
+
+# Front filter for trivial messages. Greetings, thanks and bare
+# acknowledgements don't need an LLM turn — they get a canned Spanish
+# reply for zero tokens. Hit counts are kept per kind so the filter's
+# precision can be monitored from the logs.
+_TRIVIAL_RES = {
+    'greeting': re.compile(r'^(hola|buen[oa]s(\s+(d[ií]as|tardes|noches))?|hey|hi|hello)[\s!.,]*$', re.IGNORECASE),
+    'thanks': re.compile(r'^((muchas\s+)?gracias|thanks|thank\s+you)[\s!.,]*$', re.IGNORECASE),
+    'ack': re.compile(r'^(ok|okay|vale|listo|perfecto|genial|de\s+acuerdo)[\s!.,]*$', re.IGNORECASE),
+}
+_trivial_hits: Dict[str, int] = {}
+
+def _classify_trivial(message: str) -> Optional[str]:
+    """
+    Classify a message as trivial ('greeting', 'thanks', 'ack') or None.
+    Only exact short matches count; anything with real content falls
+    through to the agent.
+    """
+    stripped = message.strip()
+    if len(stripped) > 40:
+        return None
+    for kind, pattern in _TRIVIAL_RES.items():
+        if pattern.match(stripped):
+            return kind
+    return None
+
+# Pooled agent instances keyed by the normalized (user_id, resolved
+# session_id) — see DigitalMarketingAgent._pool_key. Constructing an
+# agent costs a user lookup plus prompt/template resolution, so web
+# handlers reuse instances; TTL eviction keeps idle users from pinning
+# memory.
+_agent_pool = TTLCache(maxsize=10_000, ttl=CACHE_EXPIRATION_HOURS * 3600)
+_agent_pool_lock = RLock()
+
 # === Agent Configuration ===
 
 class DigitalMarketingAgent:
@@ -42,15 +397,24 @@ class DigitalMarketingAgent:
         self.user_id = user_id
         self.user_name = self._get_user_name(user_id)
         self.session_id = self._get_or_create_session(user_id, session_id)
+        self._cached_system_prompt: Optional[str] = None
+        self._rendered_history: Optional[List[str]] = None
         
         # Initialize components
+        self._tool_recorder = _ToolUsageRecorder()
+        self._trace_handler = SampledTraceHandler()
+        # Pooled agents are shared across concurrent requests; one turn at
+        # a time per agent keeps the memory buffer, tool recorder and
+        # rendered-history cache from racing. A plain Lock (not RLock) so
+        # the async paths may release it from a different thread.
+        self._turn_lock = Lock()
         self.llm = self._create_llm()
         self.memory = create_memory(user_id, self.session_id, self.llm)
         self.tools = self._get_tools()
         self.agent = self._create_agent()
         self.agent_executor = self._create_agent_executor()
         
-        logger.info(f"Initialized Digital Marketing Agent for user {user_id} ({self.user_name}) with session {self.session_id}")
+        logger.info("Initialized Digital Marketing Agent for user %s (%s) with session %s", user_id, self.user_name, self.session_id)
     
     def _get_user_name(self, user_id: int) -> str:
         """
@@ -62,41 +426,22 @@ class DigitalMarketingAgent:
         Returns:
             User name or 'Usuario' as fallback
         """
-        try:
-            from src.database import get_db
-            from src.models import User
-            
-            db_gen = get_db()
-            db = next(db_gen)
-            
-            user = db.query(User).filter(User.id == user_id).first()
-            if user and user.name:
-                return user.name
-            else:
-                return "Usuario"
-                
-        except Exception as e:
-            logger.error(f"Error getting user name: {e}")
-            return "Usuario"
-        finally:
-            if 'db' in locals():
-                db.close()
+        return _fetch_user_name(user_id)
     
-    def _get_or_create_session(self, user_id: int, provided_session_id: Optional[str] = None) -> str:
+    @staticmethod
+    def _get_or_create_session(user_id: int, provided_session_id: Optional[str] = None) -> str:
         """
         Get or create a persistent session ID for the user.
-        
+
         Args:
             user_id: User ID
             provided_session_id: Optional session ID (ignored for persistent sessions)
-            
+
         Returns:
             Persistent session ID
         """
         # Session ID persistente: siempre el mismo para el usuario
-        persistent_session_id = f"persistent_{user_id}"
-        logger.info(f"Using persistent session: {persistent_session_id}")
-        return persistent_session_id
+        return f"persistent_{user_id}"
     
     def _is_session_valid(self, session_id: str, timeout_minutes: int = 30) -> bool:
         """
@@ -114,21 +459,13 @@ class DigitalMarketingAgent:
     
     def _create_llm(self) -> AzureChatOpenAI:
         """
-        Create and configure the Azure OpenAI LLM.
+        Get the Azure OpenAI LLM for this agent.
         
         Returns:
-            Configured AzureChatOpenAI instance
+            The process-wide shared AzureChatOpenAI instance
         
         """
-        return AzureChatOpenAI(
-            azure_deployment=AZURE_OPENAI_DEPLOYMENT_NAME,  # Use deployment name
-            api_key=AZURE_OPENAI_API_KEY,
-            azure_endpoint=AZURE_OPENAI_ENDPOINT,
-            api_version=AZURE_API_VERSION,
-            temperature=AGENT_TEMPERATURE,  # Configurable temperature for balanced creativity
-            max_tokens=AGENT_MAX_TOKENS,
-            model=AZURE_OPENAI_DEPLOYMENT_NAME  # Required for token counting
-        )
+        return _get_shared_llm()
     
     def _get_tools(self) -> List:
         """
@@ -139,40 +476,72 @@ class DigitalMarketingAgent:
         """
         return [
             list_available_clients_tool,
-            facebook_ads_analysis_tool
+            facebook_ads_analysis_tool,
+            previous_sessions_summary_tool
         ]
     
+    def _get_base_system_prompt(self) -> str:
+        """
+        Get the shared (user-independent) system prompt from the
+        configured source (file or database).
+
+        Returns:
+            Base system prompt string, identical for every user
+        """
+        if SYSTEM_PROMPT_SOURCE == 'database':
+            return self._load_prompt_from_database()
+        return self._load_prompt_from_file()
+
     def _get_system_prompt(self) -> str:
         """
         Get system prompt from configured source (file or database).
-        
+
         Returns:
             System prompt string with user personalization
         """
-        if SYSTEM_PROMPT_SOURCE == 'database':
-            base_prompt = self._load_prompt_from_database()
-        else:
-            base_prompt = self._load_prompt_from_file()
-        
+        # Resolved once per agent: the base prompt is module-cached and the
+        # personalization only depends on the user name, so repeat callers
+        # (prompt tracking on every message) get the stored value
+        if self._cached_system_prompt is not None:
+            return self._cached_system_prompt
+
         # Personalize prompt with user name
-        personalized_prompt = self._personalize_prompt(base_prompt)
+        personalized_prompt = self._personalize_prompt(self._get_base_system_prompt())
+        self._cached_system_prompt = personalized_prompt
         return personalized_prompt
     
+    def reload_prompt(self) -> None:
+        """
+        Drop the cached prompts so the next message re-resolves them.
+        Use after an admin updates the prompt file or database version.
+        """
+        invalidate_prompt_cache()
+        self._cached_system_prompt = None
+    
+    def _get_personalization(self) -> str:
+        """
+        Build the per-user system block (everything that varies by user).
+        Kept out of the base prompt so the base stays byte-identical
+        across users and eligible for provider prompt caching.
+
+        Returns:
+            Personalization string for this user
+        """
+        return f"El usuario con el que estás hablando se llama {self.user_name}. "
+
     def _personalize_prompt(self, base_prompt: str) -> str:
         """
         Personalize system prompt with user information.
-        
+
         Args:
             base_prompt: Base system prompt
-            
+
         Returns:
             Personalized prompt with user name
         """
-        # Add user personalization at the beginning
-        personalization = f"El usuario con el que estás hablando se llama {self.user_name}. "
-        
-        # Combine personalization with base prompt
-        return base_prompt + personalization
+        # Combine base prompt with the per-user block (used for tracking;
+        # the live template keeps the two as separate system messages)
+        return base_prompt + self._get_personalization()
     
     def _load_prompt_from_file(self) -> str:
         """
@@ -182,6 +551,13 @@ class DigitalMarketingAgent:
             System prompt string
         """
         try:
+            # One stat per call: reuse the cached text unless the file
+            # changed on disk since it was read
+            mtime = os.path.getmtime(DEFAULT_PROMPT_FILE)
+            cached = _prompt_cache.get('file')
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+            
             with open(DEFAULT_PROMPT_FILE, 'r', encoding='utf-8') as f:
                 prompt = f.read().strip()
             
@@ -190,11 +566,12 @@ class DigitalMarketingAgent:
                 logger.error("Prompt file is empty")
                 return self._get_fallback_prompt()
             
-            logger.info(f"Loaded system prompt from file: {DEFAULT_PROMPT_FILE}")
-            logger.info(f"Prompt length: {len(prompt)} characters")
+            logger.info("Loaded system prompt from file: %s", DEFAULT_PROMPT_FILE)
+            logger.info("Prompt length: %d characters", len(prompt))
+            _prompt_cache['file'] = (mtime, prompt)
             return prompt
         except Exception as e:
-            logger.error(f"Error loading prompt from file: {e}")
+            logger.error("Error loading prompt from file: %s", e)
             # Fallback to hardcoded prompt
             return self._get_fallback_prompt()
     
@@ -205,44 +582,49 @@ class DigitalMarketingAgent:
         Returns:
             System prompt string
         """
+        # Fresh-enough cache entry: no database round-trip. The entry is
+        # also dropped out-of-band by the LISTEN thread on prompt updates.
+        cached = _prompt_cache.get('database')
+        if cached is not None and time.monotonic() < cached[0]:
+            return cached[1]
+
         try:
-            from src.database import get_db
-            from src.models import PromptVersion
-            
-            db_gen = get_db()
-            db = next(db_gen)
-            
-            # Get active prompt version (assuming 'system' as prompt_name)
-            active_prompt = db.query(PromptVersion).filter(
-                and_(
-                    PromptVersion.prompt_name == 'system',
-                    PromptVersion.is_active == True
-                )
-            ).first()
+            from src.database import session_scope
+
+            _ensure_prompt_listener()
+            with session_scope() as db:
+                # Narrow SELECT instead of hydrating a full PromptVersion
+                # ORM object: only the prompt text and version are needed
+                active_prompt = db.execute(
+                    _ACTIVE_PROMPT_QUERY, {"prompt_name": "system"}
+                ).first()
+
+                if active_prompt:
+                    logger.info("Loaded system prompt from database: system v%s", active_prompt.version)
+                    _prompt_cache['database'] = (
+                        time.monotonic() + _PROMPT_CACHE_TTL_SECONDS,
+                        active_prompt.prompt_text
+                    )
+                    return active_prompt.prompt_text
             
-            if active_prompt:
-                logger.info(f"Loaded system prompt from database: {active_prompt.prompt_name} v{active_prompt.version}")
-                return active_prompt.prompt_text
-            else:
-                logger.warning("No active prompt found in database, using file fallback")
-                return self._load_prompt_from_file()
+            logger.warning("No active prompt found in database, using file fallback")
+            return self._load_prompt_from_file()
                 
         except Exception as e:
-            logger.error(f"Error loading prompt from database: {e}")
+            logger.error("Error loading prompt from database: %s", e)
             return self._load_prompt_from_file()
-        finally:
-            if 'db' in locals():
-                db.close()
     
     def _get_fallback_prompt(self) -> str:
         """
         Get fallback system prompt if all else fails.
-        
+
         Returns:
             Basic fallback prompt
         """
-        return """You are a Digital Marketing expert and Facebook Ads campaign data analyst. 
-        Help the user analyze the performance of their advertising campaigns and provide valuable insights."""
+        # Deliberately minimal: the fallback is re-sent on every call, so
+        # every extra token here is paid on each turn. Tool behavior lives
+        # in the tool schemas, not in prompt prose.
+        return "You are a Digital Marketing expert in Facebook Ads. Analyze campaign performance and give actionable insights."
     
     def _create_agent(self):
         """
@@ -254,33 +636,19 @@ class DigitalMarketingAgent:
         try:
             # Get system prompt from configured source
             logger.info("Getting system prompt...")
-            system_prompt = self._get_system_prompt()
-            logger.info(f"System prompt loaded, length: {len(system_prompt)}")
-            
-            # Create prompt template
-            logger.info("Creating prompt template...")
-            prompt = ChatPromptTemplate.from_messages([
-                ("system", system_prompt),
-                MessagesPlaceholder(variable_name="chat_history"),
-                ("human", "{input}"),
-                MessagesPlaceholder(variable_name="agent_scratchpad")
-            ])
-            logger.info("Prompt template created successfully")
-            
-            # Create agent
-            logger.info("Creating OpenAI tools agent...")
-            agent = create_openai_tools_agent(
-                llm=self.llm,
-                tools=self.tools,
-                prompt=prompt
-            )
-            logger.info("Agent created successfully")
-            
+            base_prompt = self._get_base_system_prompt()
+            logger.info("System prompt loaded, length: %d", len(base_prompt))
+
+            # Compile (or reuse) the prompt template and tools agent. The
+            # static base prompt leads, the user-specific block follows:
+            # only content after the first divergent byte misses the
+            # provider's prompt cache.
+            agent = _build_agent(base_prompt, self._get_personalization(), self.llm, self.tools)
+            logger.info("Agent ready")
+
             return agent
-        except Exception as e:
-            logger.error(f"Error creating agent: {e}")
-            import traceback
-            logger.error(f"Full traceback: {traceback.format_exc()}")
+        except Exception:
+            logger.exception("Error creating agent")
             raise
     
     def _create_agent_executor(self) -> AgentExecutor:
@@ -293,11 +661,12 @@ class DigitalMarketingAgent:
         return AgentExecutor(
             agent=self.agent,
             tools=self.tools,
-            verbose=True,  # Enable detailed logging
+            verbose=False,  # Tracing goes through the sampled handler, not stdout
             handle_parsing_errors=True,  # Handle tool parsing errors gracefully
             max_iterations=AGENT_MAX_ITERATIONS,  # Configurable limit to prevent infinite loops
             early_stopping_method="generate",  # Stop early if agent generates final answer
-            return_intermediate_steps=True  # Include intermediate steps in response
+            return_intermediate_steps=DEBUG,  # Tool usage comes from the recorder in production
+            callbacks=[self._tool_recorder, self._trace_handler]
         )
     
     def process_message(self, message: str) -> str:
@@ -313,68 +682,321 @@ class DigitalMarketingAgent:
         try:
             # Validate input message
             if not message or not isinstance(message, str):
-                logger.error(f"Invalid message received: {message}")
+                logger.error("Invalid message received: %s", message)
                 return "Sorry, this message is not valid."
             
-            logger.info(f"Processing message for user {self.user_id}: {message[:100]}...")
-            
-            # Get chat history from memory
-            chat_history = self.memory.chat_memory.messages
-            logger.info(f"Chat history length: {len(chat_history)}")
-            
-            # Execute agent with user input and chat history
-            logger.info("Invoking agent executor...")
-            response = self.agent_executor.invoke({
-                "input": message,
-                "chat_history": chat_history
-            })
-            logger.info(f"Agent response received: {type(response)}")
-            
-            # Extract response text
-            response_text = response.get("output", "Sorry, I couldn't process your request.")
-            logger.info(f"Response text extracted: {response_text[:100]}...")
-            
-            # Extract tool/function used from response (try multiple methods)
-            tool_used = self._extract_tool_used(response)
-            if not tool_used:
-                # Try to extract from intermediate steps if available
-                tool_used = self._extract_tool_from_intermediate_steps(response)
-            logger.info(f"Tool used: {tool_used}")
-            
-            # Extract tool parameters (like facebook_account_id) from response
-            tool_params = self._extract_tool_parameters(response)
-            logger.info(f"Tool parameters: {tool_params}")
-            
-            # Prepare LLM parameters for tracking
-            llm_params = CostCalculator.get_llm_params_dict(
-                model_name=AZURE_OPENAI_DEPLOYMENT_NAME,
-                temperature=AGENT_TEMPERATURE,
-                max_tokens=AGENT_MAX_TOKENS
-            )
+            logger.info("Processing message for user %s: %.100s...", self.user_id, message)
+
+            # Trivial messages get a canned reply without an LLM turn
+            canned = self._check_trivial(message)
+            if canned is not None:
+                return canned
+
+            # One turn at a time: the batcher may run the same pooled
+            # agent from several threadpool workers simultaneously
+            with self._turn_lock:
+                # Serve repeat questions from the response cache
+                if _is_cacheable_message(message):
+                    cached = _response_cache.get(_response_cache_key(self.user_id, message))
+                    if cached is not None:
+                        logger.info("Response cache hit for user %s", self.user_id)
+                        return self._finalize_cached_response(message, cached)
+
+                # Get chat history from memory
+                chat_history = self.memory.chat_memory.messages
+                logger.info("Chat history length: %d", len(chat_history))
+
+                # Execute agent with user input and chat history
+                self._tool_recorder.reset()
+                logger.info("Invoking agent executor...")
+                response = self.agent_executor.invoke({
+                    "input": message,
+                    "chat_history": chat_history
+                })
+                logger.info("Agent response received: %s", type(response))
+
+                return self._finalize_response(message, chat_history, response)
             
-            # Get full prompt for tracking (system prompt + chat history + user message)
-            full_prompt = self._get_full_prompt_for_tracking(message, chat_history)
+        except Exception as e:
+            logger.exception("Error processing message")
+            return f"Sorry, an error occurred while processing your request: {str(e)}"
+    
+    async def aprocess_message(self, message: str) -> str:
+        """
+        Async variant of process_message built on agent_executor.ainvoke.
+        The LLM round-trip and tool execution release the event loop so
+        multiple users' messages can be in flight concurrently; tools
+        without a native _arun are run in the default executor by
+        LangChain. Post-processing (memory/analysis persistence) is the
+        same as the sync path.
+        
+        Args:
+            message: User's input message
+        
+        Returns:
+            Agent's response
+        """
+        try:
+            # Validate input message
+            if not message or not isinstance(message, str):
+                logger.error("Invalid message received: %s", message)
+                return "Sorry, this message is not valid."
             
-            # Save conversation to memory with full tracking
-            self.memory.save_context(
-                {"input": message},
-                {"output": response_text},
-                full_prompt_sent=full_prompt,
-                llm_params=llm_params
-            )
+            logger.info("Processing message (async) for user %s: %.100s...", self.user_id, message)
+
+            # Trivial messages get a canned reply without an LLM turn
+            canned = self._check_trivial(message)
+            if canned is not None:
+                return canned
+
+            # One turn at a time per agent; acquire off-loop so a held
+            # lock does not stall unrelated sessions
+            await asyncio.to_thread(self._turn_lock.acquire)
+            try:
+                # Serve repeat questions from the response cache
+                if _is_cacheable_message(message):
+                    cached = _response_cache.get(_response_cache_key(self.user_id, message))
+                    if cached is not None:
+                        logger.info("Response cache hit for user %s", self.user_id)
+                        return self._finalize_cached_response(message, cached)
+
+                # Get chat history from memory
+                chat_history = self.memory.chat_memory.messages
+
+                # Execute agent without blocking the event loop
+                self._tool_recorder.reset()
+                response = await self.agent_executor.ainvoke({
+                    "input": message,
+                    "chat_history": chat_history
+                })
+
+                return self._finalize_response(message, chat_history, response)
+            finally:
+                self._turn_lock.release()
             
-            # Check if a tool was used and save analysis result
-            if tool_used:
-                self._save_analysis_result(response_text, tool_used, message, tool_params)
+        except Exception as e:
+            logger.exception("Error processing message")
+            return f"Sorry, an error occurred while processing your request: {str(e)}"
+    
+    async def astream_message(self, message: str):
+        """
+        Stream the agent's answer token-by-token to cut time-to-first-token.
+        Yields output text chunks as the LLM produces them; once the run
+        finishes, the full response goes through the same persistence path
+        as process_message (memory + analysis result).
+        
+        Args:
+            message: User's input message
+        
+        Yields:
+            Output text chunks
+        """
+        try:
+            if not message or not isinstance(message, str):
+                logger.error("Invalid message received: %s", message)
+                yield "Sorry, this message is not valid."
+                return
             
-            logger.info(f"Generated response for user {self.user_id}")
-            return response_text
+            # One turn at a time per agent; acquire off-loop so a held
+            # lock does not stall unrelated sessions
+            await asyncio.to_thread(self._turn_lock.acquire)
+            try:
+                chat_history = self.memory.chat_memory.messages
+                self._tool_recorder.reset()
+                final_response = None
+
+                async for event in self.agent_executor.astream_events(
+                    {"input": message, "chat_history": chat_history}, version="v2"
+                ):
+                    kind = event.get("event")
+                    if kind == "on_chat_model_stream":
+                        chunk = event["data"].get("chunk")
+                        if chunk is not None and chunk.content:
+                            yield chunk.content
+                    elif kind == "on_chain_end" and event.get("name") == "AgentExecutor":
+                        final_response = event["data"].get("output")
+
+                # Persist through the buffered path once the stream is complete
+                if isinstance(final_response, dict):
+                    self._finalize_response(message, chat_history, final_response)
+            finally:
+                self._turn_lock.release()
             
         except Exception as e:
-            logger.error(f"Error processing message: {e}")
-            import traceback
-            logger.error(f"Full traceback: {traceback.format_exc()}")
-            return f"Sorry, an error occurred while processing your request: {str(e)}"
+            logger.exception("Error streaming message")
+            yield f"Sorry, an error occurred while processing your request: {str(e)}"
+    
+    async def abatch_process(self, messages: List[str], max_concurrency: int = 8) -> List[str]:
+        """
+        Run many inputs through the executor at once (offline/eval use).
+        Unlike the chat paths this does not persist memory or analysis
+        results — it is meant for dataset evaluation and bulk analysis
+        where only the outputs matter.
+        
+        Args:
+            messages: List of user messages to process
+            max_concurrency: Maximum number of inputs in flight at once
+        
+        Returns:
+            List of responses in the same order as messages
+        """
+        chat_history = self.memory.chat_memory.messages
+        responses = await self.agent_executor.abatch(
+            [{"input": message, "chat_history": chat_history} for message in messages],
+            config={"max_concurrency": max_concurrency}
+        )
+        return [response.get("output", "") for response in responses]
+    
+    @classmethod
+    def _pool_key(cls, user_id, session_id: Optional[str] = None) -> tuple:
+        """
+        Normalized pool key for a user/session. The HTTP layer passes the
+        user id as an int from /chat but as a string parsed out of a
+        session id from the clear endpoints, and every provided session
+        resolves to the same persistent session — all spellings must map
+        to the same pooled instance, or a "cleared" agent survives in the
+        pool with its full in-memory history.
+        """
+        uid = int(user_id)
+        return uid, cls._get_or_create_session(uid, session_id)
+
+    @classmethod
+    def get(cls, user_id, session_id: Optional[str] = None) -> "DigitalMarketingAgent":
+        """
+        Get a pooled agent for the given user/session, constructing and
+        caching one on first use. Prefer this over direct construction
+        in request handlers.
+        """
+        key = cls._pool_key(user_id, session_id)
+        with _agent_pool_lock:
+            agent = _agent_pool.get(key)
+            if agent is None:
+                agent = cls(user_id=key[0], session_id=session_id)
+                _agent_pool[key] = agent
+            return agent
+
+    @classmethod
+    def evict(cls, user_id, session_id: Optional[str] = None) -> None:
+        """
+        Remove a pooled agent (e.g. after its session is cleared).
+        """
+        with _agent_pool_lock:
+            _agent_pool.pop(cls._pool_key(user_id, session_id), None)
+    
+    @classmethod
+    async def batch_process(cls, pairs: List[tuple], max_inflight: int = 16) -> List[str]:
+        """
+        Process many users' pending messages concurrently.
+        
+        Args:
+            pairs: List of (user_id, message) tuples
+            max_inflight: Maximum number of concurrent agent runs
+        
+        Returns:
+            List of responses in the same order as pairs
+        """
+        semaphore = asyncio.Semaphore(max_inflight)
+        
+        async def run_one(user_id: int, message: str) -> str:
+            async with semaphore:
+                # Agent lookup/construction touches the DB; keep it off the loop
+                agent = await asyncio.to_thread(cls.get, user_id)
+                return await agent.aprocess_message(message)
+        
+        return await asyncio.gather(*[run_one(user_id, message) for user_id, message in pairs])
+    
+    def _check_trivial(self, message: str) -> Optional[str]:
+        """
+        Return a canned reply for trivial messages (greetings, thanks,
+        acknowledgements), or None if the message needs the agent.
+        Short-circuited turns are not written to memory — they carry no
+        context worth summarizing.
+        """
+        kind = _classify_trivial(message)
+        if kind is None:
+            return None
+        _trivial_hits[kind] = _trivial_hits.get(kind, 0) + 1
+        logger.info("Trivial message short-circuit (%s, hit #%d) for user %s", kind, _trivial_hits[kind], self.user_id)
+        if kind == 'greeting':
+            return (
+                f"¡Hola {self.user_name}! Soy tu asistente de análisis de Facebook Ads. "
+                "¿Qué cuenta publicitaria te gustaría analizar hoy?"
+            )
+        if kind == 'thanks':
+            return "¡De nada! Si necesitas otro análisis de tus campañas, aquí estoy."
+        return "¡Perfecto! ¿Seguimos con algún análisis de tus campañas?"
+
+    def _finalize_cached_response(self, message: str, response_text: str) -> str:
+        """
+        Persistence path for response-cache hits. The LLM round-trip was
+        skipped but the turn still happened, so it is written to memory
+        and conversation_history like any other (that table is the
+        tracking/billing ground truth). No full prompt is recorded —
+        zero tokens were spent on this turn.
+        """
+        self.memory.save_context(
+            {"input": message},
+            {"output": response_text},
+            full_prompt_sent=None,
+            llm_params={"cached": True}
+        )
+        if self._rendered_history is not None:
+            self._rendered_history.append(f"Human: {message}")
+            self._rendered_history.append(f"AI: {response_text}")
+        return response_text
+
+    def _finalize_response(self, message: str, chat_history: List, response: Dict[str, Any]) -> str:
+        """
+        Shared post-processing for sync and async message paths:
+        extract the answer and tool usage, persist conversation memory,
+        and save the analysis result when a tool ran.
+        """
+        # Extract response text
+        response_text = response.get("output")
+        if response_text is None:
+            logger.error("Agent response has no output key: %s", list(response))
+            response_text = "Sorry, I couldn't process your request."
+        logger.info("Response text extracted: %.100s...", response_text)
+        
+        # Extract tool usage (name + parameters) in one pass
+        tool_used, tool_params = self._extract_tool_info(response)
+        
+        # Prepare LLM parameters for tracking
+        llm_params = CostCalculator.get_llm_params_dict(
+            model_name=AZURE_OPENAI_DEPLOYMENT_NAME,
+            temperature=AGENT_TEMPERATURE,
+            max_tokens=AGENT_MAX_TOKENS
+        )
+        
+        # Get full prompt for tracking (system prompt + chat history + user message)
+        full_prompt = self._get_full_prompt_for_tracking(message, chat_history)
+        
+        # Save conversation to memory with full tracking
+        self.memory.save_context(
+            {"input": message},
+            {"output": response_text},
+            full_prompt_sent=full_prompt,
+            llm_params=llm_params
+        )
+        
+        # Record the assistant turn in the rendered-history cache
+        if self._rendered_history is not None:
+            self._rendered_history.append(f"AI: {response_text}")
+        
+        # Check if a tool was used and save analysis result off the
+        # critical path; failures log inside the task without affecting
+        # the reply
+        if tool_used:
+            _save_executor.submit(self._save_analysis_result, response_text, tool_used, message, tool_params)
+        
+        # Store for repeat questions from the same user; a malformed
+        # response fell back to the apology above and must not get pinned
+        # as the cached answer for the TTL window
+        if "output" in response and _is_cacheable_message(message):
+            _response_cache[_response_cache_key(self.user_id, message)] = response_text
+        
+        logger.info("Generated response for user %s", self.user_id)
+        return response_text
     
     def get_session_info(self) -> Dict[str, Any]:
         """
@@ -390,7 +1012,7 @@ class DigitalMarketingAgent:
         Clear the current conversation session.
         """
         self.memory.clear_session()
-        logger.info(f"Cleared session for user {self.user_id}")
+        logger.info("Cleared session for user %s", self.user_id)
     
     def get_conversation_summary(self) -> str:
         """
@@ -413,152 +1035,87 @@ class DigitalMarketingAgent:
             Full prompt string for tracking
         """
         try:
-            # Get system prompt
-            system_prompt = self._get_system_prompt()
-            
-            # Build full prompt
-            full_prompt_parts = [f"System: {system_prompt}"]
-            
-            # Add chat history
-            for msg in chat_history:
-                if hasattr(msg, 'content'):
-                    if hasattr(msg, 'type'):
-                        if msg.type == 'human':
-                            full_prompt_parts.append(f"Human: {msg.content}")
-                        elif msg.type == 'ai':
-                            full_prompt_parts.append(f"AI: {msg.content}")
-                    else:
-                        # Fallback for different message types
-                        full_prompt_parts.append(f"Message: {msg.content}")
+            # Render the existing history once per session; after that each
+            # turn only appends its own two lines instead of re-walking the
+            # whole dialogue (which made tracking O(N^2) over a session).
+            # When the summary memory prunes the live buffer the lengths
+            # diverge — rebuild so the tracked prompt matches what is sent.
+            if (self._rendered_history is None
+                    or len(self._rendered_history) != len(chat_history)):
+                self._rendered_history = [self._render_message(msg) for msg in chat_history]
             
-            # Add current user message
+            full_prompt_parts = [f"System: {self._get_system_prompt()}"]
+            full_prompt_parts.extend(self._rendered_history)
             full_prompt_parts.append(f"Human: {user_message}")
             
+            # Keep the cache current for the next turn
+            self._rendered_history.append(f"Human: {user_message}")
+            
             return "\n\n".join(full_prompt_parts)
             
         except Exception as e:
-            logger.error(f"Error building full prompt for tracking: {e}")
+            logger.error("Error building full prompt for tracking: %s", e)
             return f"System: {self._get_system_prompt()}\n\nHuman: {user_message}"
     
-    def _extract_tool_used(self, response: Dict[str, Any]) -> Optional[str]:
-        """
-        Extract the tool/function name used by the agent from the response.
-        
-        Args:
-            response: The agent's response dictionary
-            
-        Returns:
-            Tool name if a tool was used, None otherwise
-        """
-        try:
-            # Check if the response contains intermediate steps (tool calls)
-            if 'intermediate_steps' in response:
-                intermediate_steps = response['intermediate_steps']
-                if intermediate_steps:
-                    # Get the last tool used
-                    last_step = intermediate_steps[-1]
-                    if len(last_step) >= 2:
-                        action = last_step[0]
-                        if hasattr(action, 'tool'):
-                            tool_name = action.tool
-                            logger.info(f"Tool used: {tool_name}")
-                            return tool_name
-                        elif hasattr(action, 'tool_name'):
-                            tool_name = action.tool_name
-                            logger.info(f"Tool used: {tool_name}")
-                            return tool_name
-            
-            # Alternative: check if response contains tool information in other formats
-            if isinstance(response, dict):
-                # Look for tool information in various possible locations
-                for key in ['tool', 'tool_name', 'function_name', 'action']:
-                    if key in response and response[key]:
-                        logger.info(f"Tool found in {key}: {response[key]}")
-                        return str(response[key])
-            
-            logger.info("No tool was used in this response")
-            return None
-            
-        except Exception as e:
-            logger.error(f"Error extracting tool used: {e}")
-            return None
+    # Tracking labels per LangChain message type; anything unknown falls
+    # through to the generic label
+    _MESSAGE_LABELS = {'human': 'Human', 'ai': 'AI'}
     
-    def _extract_tool_from_intermediate_steps(self, response: Dict[str, Any]) -> Optional[str]:
+    @classmethod
+    def _render_message(cls, msg) -> str:
         """
-        Extract tool name from intermediate steps in the response.
-        
-        Args:
-            response: The agent's response dictionary
-            
-        Returns:
-            Tool name if found in intermediate steps, None otherwise
+        Render one chat message as its tracking line.
         """
-        try:
-            # Check if intermediate_steps exists and has content
-            if 'intermediate_steps' in response and response['intermediate_steps']:
-                intermediate_steps = response['intermediate_steps']
-                logger.info(f"Found {len(intermediate_steps)} intermediate steps")
-                
-                # Get the last tool used (most recent)
-                for step in reversed(intermediate_steps):
-                    if len(step) >= 2:
-                        action = step[0]
-                        # Check various possible attributes for tool name
-                        if hasattr(action, 'tool') and action.tool:
-                            logger.info(f"Found tool in action.tool: {action.tool}")
-                            return action.tool
-                        elif hasattr(action, 'tool_name') and action.tool_name:
-                            logger.info(f"Found tool in action.tool_name: {action.tool_name}")
-                            return action.tool_name
-                        elif hasattr(action, 'action') and action.action:
-                            logger.info(f"Found tool in action.action: {action.action}")
-                            return action.action
-                
-                logger.info("No tool found in intermediate steps")
-                return None
-            else:
-                logger.info("No intermediate steps found in response")
-                return None
-                
-        except Exception as e:
-            logger.error(f"Error extracting tool from intermediate steps: {e}")
-            return None
+        label = cls._MESSAGE_LABELS.get(getattr(msg, 'type', None), 'Message')
+        return f"{label}: {getattr(msg, 'content', '')}"
     
-    def _extract_tool_parameters(self, response: Dict[str, Any]) -> Dict[str, Any]:
+    def _extract_tool_info(self, response: Dict[str, Any]) -> tuple:
         """
-        Extract tool parameters from the response.
+        Extract the tool name and its parameters from the agent response
+        in a single pass over intermediate_steps.
         
         Args:
             response: The agent's response dictionary
             
         Returns:
-            Dictionary with tool parameters (e.g., {'ad_account_id': 'act_123456'})
+            Tuple of (tool name or None, tool parameters dict)
         """
         try:
-            # Check if intermediate_steps exists and has content
-            if 'intermediate_steps' in response and response['intermediate_steps']:
-                intermediate_steps = response['intermediate_steps']
-                logger.info(f"Extracting parameters from {len(intermediate_steps)} intermediate steps")
-                
-                # Get parameters from the last tool used (most recent)
-                for step in reversed(intermediate_steps):
-                    if len(step) >= 2:
-                        action = step[0]
-                        # Check for tool_input parameter
-                        if hasattr(action, 'tool_input') and action.tool_input:
-                            tool_input = action.tool_input
-                            logger.info(f"Found tool parameters: {tool_input}")
-                            return tool_input
-                
-                logger.info("No tool parameters found in intermediate steps")
-                return {}
-            else:
-                logger.info("No intermediate steps found for parameter extraction")
-                return {}
-                
+            # Preferred source: the callback recorder, which works without
+            # materializing intermediate steps
+            if self._tool_recorder.last_tool:
+                tool_name = self._tool_recorder.last_tool
+                tool_params = self._tool_recorder.last_tool_input
+                logger.info("Tool used: %s with parameters: %s", tool_name, tool_params)
+                return tool_name, tool_params
+            
+            # Debug fallback: the most recent step carries both the tool
+            # and its input
+            for step in reversed(response.get('intermediate_steps', [])):
+                if len(step) >= 2:
+                    action = step[0]
+                    tool_name = (
+                        getattr(action, 'tool', None)
+                        or getattr(action, 'tool_name', None)
+                        or getattr(action, 'action', None)
+                    )
+                    tool_params = getattr(action, 'tool_input', None) or {}
+                    if tool_name:
+                        logger.info("Tool used: %s with parameters: %s", tool_name, tool_params)
+                        return tool_name, tool_params
+            
+            # Alternative: tool information surfaced directly on the response
+            for key in ('tool', 'tool_name', 'function_name', 'action'):
+                if response.get(key):
+                    logger.info("Tool found in %s: %s", key, response[key])
+                    return str(response[key]), {}
+            
+            logger.info("No tool was used in this response")
+            return None, {}
+            
         except Exception as e:
-            logger.error(f"Error extracting tool parameters: {e}")
-            return {}
+            logger.error("Error extracting tool info: %s", e)
+            return None, {}
     
     def _save_analysis_result(self, response_text: str, tool_used: str, user_message: str, tool_params: Dict[str, Any] = None) -> None:
         """
@@ -571,58 +1128,53 @@ class DigitalMarketingAgent:
             tool_params: Parameters passed to the tool (e.g., {'ad_account_id': 'act_123456'})
         """
         try:
-            db_gen = get_db()
-            db = next(db_gen)
-            
-            # Extract Facebook account ID from tool parameters or fallback to text extraction
-            facebook_account_id = None
-            if tool_params and 'ad_account_id' in tool_params:
-                # Get Facebook account ID from tool parameters
-                ad_account_id = tool_params['ad_account_id']
-                facebook_account = db.query(FacebookAccount).filter(
-                    FacebookAccount.ad_account_id == ad_account_id
-                ).first()
-                if facebook_account:
-                    facebook_account_id = facebook_account.id
-                    logger.info(f"Found Facebook account ID: {facebook_account_id} for {ad_account_id}")
-                else:
-                    logger.warning(f"Facebook account not found in database for {ad_account_id}")
-            else:
-                # Fallback to text extraction method
-                facebook_account_id = self._extract_facebook_account_id(user_message, response_text, db)
-            
-            # Prepare metadata including tool parameters
-            metadata = {
-                'tool_used': tool_used,
-                'tool_parameters': tool_params or {},
-                'user_message': user_message,
-                'response_length': len(response_text),
-                'saved_at': datetime.now().isoformat(),
-                'session_id': self.memory.session_id
-            }
-            
-            # Create analysis result record using tool name as analysis_type
-            analysis_result = AnalysisResult(
-                user_id=self.user_id,
-                session_id=self.memory.session_id,
-                analysis_type=tool_used,  # Use tool name as analysis type
-                facebook_account_id=facebook_account_id,
-                result_text=response_text,
-                analysis_metadata=metadata
-            )
-            
-            db.add(analysis_result)
-            db.commit()
-            
-            logger.info(f"Saved analysis result using tool: {tool_used} for user {self.user_id} with facebook_account_id: {facebook_account_id}")
-            
+            with session_scope() as db:
+                self._save_analysis_result_in_session(db, response_text, tool_used, user_message, tool_params)
         except Exception as e:
-            logger.error(f"Error saving analysis result: {e}")
-            if 'db' in locals():
-                db.rollback()
-        finally:
-            if 'db' in locals():
-                db.close()
+            logger.error("Error saving analysis result: %s", e)
+    
+    def _save_analysis_result_in_session(self, db, response_text: str, tool_used: str, user_message: str, tool_params: Dict[str, Any] = None) -> None:
+        """
+        Persist the analysis result using an already-open session.
+        """
+        # Resolve the Facebook account: tool parameters first (the common
+        # case for Facebook-tool turns), regex over the texts only as a
+        # fallback
+        ad_account_id = (tool_params or {}).get('ad_account_id')
+        if ad_account_id:
+            facebook_account_id = _resolve_facebook_account_id(db, ad_account_id)
+            if facebook_account_id is not None:
+                logger.info("Found Facebook account ID: %s for %s", facebook_account_id, ad_account_id)
+            else:
+                logger.warning("Facebook account not found in database for %s", ad_account_id)
+        else:
+            facebook_account_id = self._extract_facebook_account_id(user_message, response_text, db)
+        
+        # Prepare metadata including tool parameters. response_length and
+        # saved_at were dropped: the first is LENGTH(result_text) at query
+        # time and the row's created_at column already records the
+        # server-side timestamp.
+        metadata = {
+            'tool_used': tool_used,
+            'tool_parameters': tool_params or {},
+            'user_message': user_message,
+            'session_id': self.memory.session_id
+        }
+        
+        # Create analysis result record using tool name as analysis_type
+        analysis_result = AnalysisResult(
+            user_id=self.user_id,
+            session_id=self.memory.session_id,
+            analysis_type=tool_used,  # Use tool name as analysis type
+            facebook_account_id=facebook_account_id,
+            result_text=response_text,
+            analysis_metadata=metadata
+        )
+        
+        db.add(analysis_result)
+        db.commit()
+        
+        logger.info("Saved analysis result using tool: %s for user %s with facebook_account_id: %s", tool_used, self.user_id, facebook_account_id)
     
     def _extract_facebook_account_id(self, user_message: str, response_text: str, db) -> Optional[int]:
         """
@@ -637,46 +1189,47 @@ class DigitalMarketingAgent:
             Facebook account ID if found, None otherwise
         """
         try:
-            import re
-            
             # Look for account ID patterns in both messages
             text_to_search = f"{user_message} {response_text}"
             
-            # Pattern for Facebook account IDs (act_ followed by numbers)
-            account_pattern = r'act_(\d+)'
-            matches = re.findall(account_pattern, text_to_search)
+            # Only the first act_<digits> hit is used, so search beats findall
+            match = _ACCOUNT_RE.search(text_to_search)
             
-            if matches:
-                # Get the first match and try to find it in the database
-                account_id = f"act_{matches[0]}"
-                facebook_account = db.query(FacebookAccount).filter(
-                    FacebookAccount.ad_account_id == account_id
-                ).first()
+            if match:
+                account_id = match.group(0)
+                facebook_account_id = _resolve_facebook_account_id(db, account_id)
                 
-                if facebook_account:
-                    logger.info(f"Found Facebook account ID: {facebook_account.id} for {account_id}")
-                    return facebook_account.id
+                if facebook_account_id is not None:
+                    logger.info("Found Facebook account ID: %s for %s", facebook_account_id, account_id)
+                    return facebook_account_id
             
             return None
             
         except Exception as e:
-            logger.error(f"Error extracting Facebook account ID: {e}")
+            logger.error("Error extracting Facebook account ID: %s", e)
             return None
 
 # === Utility Functions ===
 
+# Anything outside this set is collapsed to '_' for filename compatibility
+_SESSION_ID_UNSAFE_RE = re.compile(r'[^A-Za-z0-9_]+')
+
 def generate_session_id(user_id: int) -> str:
     """
-    Generate a readable session ID using timestamp and user_id.
-    
+    Generate a session ID using a timestamp and the user_id.
+    The timestamp is the current epoch in milliseconds rendered as hex:
+    unique at this granularity, sortable, and much cheaper to produce
+    than a strftime-formatted datetime.
+
     Args:
         user_id: User ID (foreign key to users table)
-    
+
     Returns:
         Formatted session ID: timestamp_userid
     """
-    from datetime import datetime
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    # Clean user_id for filename compatibility (convert to string first)
-    clean_user_id = str(user_id).replace("@", "_at_").replace(".", "_")
+    timestamp = format(time.time_ns() // 1_000_000, 'x')
+    # Clean user_id for filename compatibility; "@" keeps its dedicated
+    # "_at_" encoding so the parser in main.py can invert it, everything
+    # else collapses to "_" in a single regex pass
+    clean_user_id = _SESSION_ID_UNSAFE_RE.sub('_', str(user_id).replace('@', '_at_'))
     return f"{timestamp}_{clean_user_id}"
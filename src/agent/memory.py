@@ -1,18 +1,24 @@
 # === File: src/agent/memory.py ===
 
+import atexit
+from functools import lru_cache
+import queue
+import threading
+import time
 import uuid
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, delete, func, insert, select
 
+import httpx
 from langchain.memory import ConversationSummaryBufferMemory
 from langchain.schema import BaseMessage, HumanMessage, AIMessage
 from langchain_openai import AzureChatOpenAI
 
 
-from src.database import get_db
-from src.models import ConversationHistory
+from src.database import session_scope
+from src.models import ConversationHistory, SessionSummary
 from src.utils.cost_calculator import CostCalculator
 from config import (
     AZURE_OPENAI_ENDPOINT, 
@@ -26,6 +32,116 @@ from src.logging_config import get_logger
 
 logger = get_logger(__name__)
 
+@lru_cache(maxsize=1)
+def _get_summary_llm() -> AzureChatOpenAI:
+    """
+    Build the summarization LLM once per process. Memories that are not
+    handed the agent's client share this one, with a keepalive pool so
+    summary calls reuse warm TLS sessions.
+    """
+    http_client = httpx.Client(
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=40),
+        timeout=httpx.Timeout(60.0, connect=10.0)
+    )
+    return AzureChatOpenAI(
+        azure_deployment=AZURE_OPENAI_DEPLOYMENT_NAME,  # Use deployment name
+        api_key=AZURE_OPENAI_API_KEY,
+        azure_endpoint=AZURE_OPENAI_ENDPOINT,
+        api_version=AZURE_API_VERSION,
+        temperature=MEMORY_TEMPERATURE,  # Configurable temperature for consistent summarization
+        model=AZURE_OPENAI_DEPLOYMENT_NAME,  # Required for token counting
+        http_client=http_client
+    )
+
+# === Background Conversation Writer ===
+
+# Conversation rows are bookkeeping the user never waits on, so saves are
+# queued and flushed by a daemon thread in small batches (up to
+# _WRITE_BATCH_SIZE rows or ~50ms of accumulation per commit).
+_WRITE_BATCH_SIZE = 16
+_WRITE_WINDOW_SECONDS = 0.05
+
+_write_queue: queue.Queue = queue.Queue()
+
+# How many recent messages to rehydrate on session load. Roughly
+# MEMORY_MAX_TOKEN_LIMIT / 50 tokens per message — anything older would
+# be pruned into the summary by ConversationSummaryBufferMemory anyway.
+_HISTORY_WINDOW_SIZE = 40
+
+def _drain_write_queue() -> None:
+    """
+    Writer loop: collect a batch from the queue and persist it in one
+    session/commit. Failures are logged and never propagate.
+    """
+    while True:
+        batch = [_write_queue.get()]
+        deadline = time.monotonic() + _WRITE_WINDOW_SECONDS
+        while len(batch) < _WRITE_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(_write_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        
+        try:
+            with session_scope() as db:
+                # Core executemany: one multi-row INSERT per batch, with no
+                # ORM identity-map bookkeeping or autoincrement-id fetch
+                # (nothing reads the new ids)
+                db.execute(insert(ConversationHistory), batch)
+                db.commit()
+        except Exception as e:
+            logger.error(f"Error saving conversation batch to database: {e}")
+        finally:
+            for _ in batch:
+                _write_queue.task_done()
+
+_writer_thread = threading.Thread(
+    target=_drain_write_queue, daemon=True, name="conversation-writer"
+)
+_writer_thread.start()
+
+def flush_pending_writes() -> None:
+    """
+    Block until every queued conversation row has been persisted.
+    Registered at exit, and used before operations that must observe a
+    consistent database state (e.g. clearing a session).
+    """
+    _write_queue.join()
+
+atexit.register(flush_pending_writes)
+
+class _TokenCachingSummaryMemory(ConversationSummaryBufferMemory):
+    """
+    ConversationSummaryBufferMemory whose pruning reuses per-message
+    token counts. Upstream re-tokenizes the entire buffer on every
+    save_context; here each message is tokenized once and the count is
+    cached on msg.additional_kwargs, so a turn costs O(new messages)
+    tokenization instead of O(buffer).
+    """
+    
+    def _message_tokens(self, message: BaseMessage) -> int:
+        cached = message.additional_kwargs.get('n_tokens')
+        if cached is None:
+            cached = self.llm.get_num_tokens_from_messages([message])
+            message.additional_kwargs['n_tokens'] = cached
+        return cached
+    
+    def prune(self) -> None:
+        buffer = self.chat_memory.messages
+        curr_buffer_length = sum(self._message_tokens(m) for m in buffer)
+        if curr_buffer_length > self.max_token_limit:
+            pruned_memory = []
+            while curr_buffer_length > self.max_token_limit and buffer:
+                pruned = buffer.pop(0)
+                pruned_memory.append(pruned)
+                curr_buffer_length -= pruned.additional_kwargs.get('n_tokens', 0)
+            self.moving_summary_buffer = self.predict_new_summary(
+                pruned_memory, self.moving_summary_buffer
+            )
+
 class DatabaseConversationMemory:
     """
     Custom memory class that uses ConversationSummaryBufferMemory internally
@@ -46,57 +162,97 @@ class DatabaseConversationMemory:
         self.user_id = user_id
         self.session_id = session_id or str(uuid.uuid4())
         
-        # Use provided LLM or create new one
-        if llm is not None:
-            self._llm = llm
-        else:
-            # Initialize Azure OpenAI LLM for summarization
-            self._llm = AzureChatOpenAI(
-                azure_deployment=AZURE_OPENAI_DEPLOYMENT_NAME,  # Use deployment name
-                api_key=AZURE_OPENAI_API_KEY,
-                azure_endpoint=AZURE_OPENAI_ENDPOINT,
-                api_version=AZURE_API_VERSION,
-                temperature=MEMORY_TEMPERATURE,  # Configurable temperature for consistent summarization
-                model=AZURE_OPENAI_DEPLOYMENT_NAME  # Required for token counting
-            )
+        # Use provided LLM (the agent passes its shared client) or the
+        # process-wide summarization client
+        self._llm = llm if llm is not None else _get_summary_llm()
         
         # Initialize internal memory using composition instead of inheritance
-        self._memory = ConversationSummaryBufferMemory(
+        self._memory = _TokenCachingSummaryMemory(
             llm=self._llm,
             max_token_limit=MEMORY_MAX_TOKEN_LIMIT,  # Configurable token limit for summarization
             return_messages=True,
             **kwargs
         )
         
-        # Load existing conversation history and long-term memory
-        self._load_conversation_history()
-        self._load_long_term_memory()
-        
+        # History is hydrated lazily on first access: constructing a
+        # memory (e.g. for a turn that never consumes chat history, or a
+        # get_session_info call) costs no database round-trip.
+        self._history_loaded = False
+
+        # Last summary text persisted to session_summaries; upserts only
+        # happen when pruning actually changes the summary
+        self._persisted_summary: Optional[str] = None
+
+        # Running message count for get_session_info: synced at hydration,
+        # bumped per saved turn — an O(1) read that doesn't reach through
+        # the LangChain memory internals on every status call
+        self._msg_count = 0
+
         logger.info(f"Initialized memory for user {user_id}, session {self.session_id}")
-    
+
+    def _ensure_history_loaded(self) -> None:
+        """
+        Load conversation history and long-term context on first use.
+        Subsequent calls are no-ops.
+        """
+        if self._history_loaded:
+            return
+        self._history_loaded = True
+        self._load_conversation_history()
+
     def _load_conversation_history(self) -> None:
         """
         Load existing conversation history from database.
         """
         try:
-            db_gen = get_db()
-            db = next(db_gen)
-            
-            # Query conversation history for this user and session
-            conversations = db.query(ConversationHistory).filter(
-                and_(
-                    ConversationHistory.user_id == self.user_id,
-                    ConversationHistory.session_id == self.session_id
-                )
-            ).order_by(ConversationHistory.timestamp.asc()).all()
+            with session_scope() as db:
+                # Restore the persisted rolling summary first, so resuming
+                # a long session doesn't re-run the summarization LLM call
+                # over history that was already pruned before the restart
+                summary_text = db.execute(
+                    select(SessionSummary.summary_text)
+                    .where(SessionSummary.session_id == self.session_id)
+                ).scalar_one_or_none()
+                if isinstance(summary_text, str) and summary_text:
+                    self._memory.moving_summary_buffer = summary_text
+                    self._persisted_summary = summary_text
+                    logger.info(f"Restored conversation summary for session {self.session_id}")
+
+                # Query the most recent window of history for this user and
+                # session; loading a long session stays O(window), not O(N).
+                # Core select of the two text columns — no ORM hydration.
+                conversations = db.execute(
+                    select(ConversationHistory.user_prompt, ConversationHistory.llm_response)
+                    .where(
+                        ConversationHistory.user_id == self.user_id,
+                        ConversationHistory.session_id == self.session_id
+                    )
+                    .order_by(ConversationHistory.timestamp.desc())
+                    .limit(_HISTORY_WINDOW_SIZE)
+                ).all()
+
+                # Full history size for get_session_info: the counter must
+                # keep the same semantics as the cold-path COUNT(*), not
+                # shrink to the rehydrated window on first use
+                total_pairs = db.execute(
+                    select(func.count())
+                    .select_from(ConversationHistory)
+                    .where(
+                        ConversationHistory.user_id == self.user_id,
+                        ConversationHistory.session_id == self.session_id
+                    )
+                ).scalar_one()
+
+            # Restore chronological order
+            conversations.reverse()
             
-            # Convert database records to LangChain messages
+            # Convert rows to LangChain messages
             messages = []
-            for conv in conversations:
-                if conv.user_prompt:
-                    messages.append(HumanMessage(content=conv.user_prompt))
-                if conv.llm_response:
-                    messages.append(AIMessage(content=conv.llm_response))
+            for user_prompt, llm_response in conversations:
+                if user_prompt:
+                    messages.append(HumanMessage(content=user_prompt))
+                if llm_response:
+                    messages.append(AIMessage(content=llm_response))
             
             # Load messages into memory
             if messages:
@@ -104,77 +260,11 @@ class DatabaseConversationMemory:
                 logger.info(f"Loaded {len(conversations)} conversation pairs from database")
             else:
                 logger.info("No previous conversation history found")
+            # Each stored row holds a Human/AI message pair
+            self._msg_count = total_pairs * 2
                 
         except Exception as e:
             logger.error(f"Error loading conversation history: {e}")
-        finally:
-            if 'db' in locals():
-                db.close()
-    
-    def _load_long_term_memory(self) -> None:
-        """
-        Load long-term memory from previous sessions for this user.
-        This provides context from past conversations when starting a new session.
-        """
-        try:
-            db_gen = get_db()
-            db = next(db_gen)
-            
-            # Get recent conversation summaries from other sessions
-            # Look for sessions from the last 7 days, excluding current session
-            from datetime import datetime, timedelta
-            week_ago = datetime.now() - timedelta(days=7)
-            
-            # Query for recent sessions with conversation data
-            recent_sessions = db.query(ConversationHistory).filter(
-                and_(
-                    ConversationHistory.user_id == self.user_id,
-                    ConversationHistory.session_id != self.session_id,
-                    ConversationHistory.timestamp >= week_ago
-                )
-            ).order_by(ConversationHistory.timestamp.desc()).limit(5).all()
-            
-            if recent_sessions:
-                # Create a summary of recent conversations
-                session_summaries = []
-                current_session = None
-                
-                for conv in recent_sessions:
-                    if conv.session_id != current_session:
-                        if current_session:
-                            session_summaries.append(f"Sesión {current_session}: {len(session_messages)} mensajes")
-                        current_session = conv.session_id
-                        session_messages = []
-                    
-                    if conv.user_prompt:
-                        session_messages.append(f"Usuario: {conv.user_prompt[:100]}...")
-                    if conv.llm_response:
-                        session_messages.append(f"Asistente: {conv.llm_response[:100]}...")
-                
-                # Add the last session
-                if current_session:
-                    session_summaries.append(f"Sesión {current_session}: {len(session_messages)} mensajes")
-                
-                # Create long-term memory context
-                if session_summaries:
-                    long_term_context = f"Contexto de conversaciones recientes: {'; '.join(session_summaries)}"
-                    
-                    # Add as a system message to provide context
-                    from langchain.schema import SystemMessage
-                    system_message = SystemMessage(content=long_term_context)
-                    self._memory.chat_memory.messages.insert(0, system_message)
-                    
-                    logger.info(f"Loaded long-term memory context: {len(session_summaries)} recent sessions")
-                else:
-                    logger.info("No recent sessions found for long-term memory")
-            else:
-                logger.info("No previous conversations found for this user")
-                
-        except Exception as e:
-            logger.error(f"Error loading long-term memory: {e}")
-        finally:
-            if 'db' in locals():
-                db.close()
     
     def _save_conversation_pair(self, human_message: str, ai_message: str, 
                                full_prompt_sent: str = None, llm_params: dict = None) -> None:
@@ -188,9 +278,6 @@ class DatabaseConversationMemory:
             llm_params: LLM parameters used (optional)
         """
         try:
-            db_gen = get_db()
-            db = next(db_gen)
-            
             # Calculate token usage and cost
             tokens_used = 0
             estimated_cost = None
@@ -210,32 +297,60 @@ class DatabaseConversationMemory:
                     input_tokens, output_tokens, model_name
                 )
             
-            # Create conversation history record with full tracking
-            conversation = ConversationHistory(
-                user_id=self.user_id,
-                session_id=self.session_id,
-                user_prompt=human_message,
-                full_prompt_sent=full_prompt_sent,
-                llm_response=ai_message,
-                llm_params=llm_params,
-                tokens_used=tokens_used,
-                estimated_cost_usd=estimated_cost,
-                timestamp=datetime.now()
-            )
-            
-            db.add(conversation)
-            db.commit()
+            # Conversation row as plain values — the writer feeds these
+            # straight into a Core multi-row INSERT. The timestamp column
+            # is deliberately omitted: the server_default stamps rows with
+            # the database clock, keeping ordering consistent across app
+            # replicas with skewed clocks.
+            conversation = {
+                "user_id": self.user_id,
+                "session_id": self.session_id,
+                "user_prompt": human_message,
+                "full_prompt_sent": full_prompt_sent,
+                "llm_response": ai_message,
+                "llm_params": llm_params,
+                "tokens_used": tokens_used,
+                "estimated_cost_usd": estimated_cost
+            }
+
+            # Hand off to the background writer; the agent turn returns
+            # without paying the INSERT/commit round-trip
+            _write_queue.put(conversation)
             
-            logger.info(f"Saved conversation pair to database for session {self.session_id} (tokens: {tokens_used}, cost: ${estimated_cost})")
+            logger.info(f"Queued conversation pair for session {self.session_id} (tokens: {tokens_used}, cost: ${estimated_cost})")
             
         except Exception as e:
             logger.error(f"Error saving conversation to database: {e}")
-            if 'db' in locals():
-                db.rollback()
-        finally:
-            if 'db' in locals():
-                db.close()
     
+    def _maybe_persist_summary(self) -> None:
+        """
+        Upsert the rolling summary when pruning changed it. The summary
+        only moves when old turns get folded in, so most turns skip the
+        write entirely.
+        """
+        try:
+            summary = self._memory.moving_summary_buffer
+            if not isinstance(summary, str) or not summary or summary == self._persisted_summary:
+                return
+
+            with session_scope() as db:
+                # merge() keeps the upsert dialect-agnostic (the test
+                # database is sqlite); summary changes are rare enough
+                # that the extra SELECT doesn't matter
+                db.merge(SessionSummary(
+                    session_id=self.session_id,
+                    user_id=self.user_id,
+                    summary_text=summary,
+                    summary_up_to_ts=datetime.now()
+                ))
+                db.commit()
+
+            self._persisted_summary = summary
+            logger.info(f"Persisted conversation summary for session {self.session_id}")
+
+        except Exception as e:
+            logger.error(f"Error persisting session summary: {e}")
+
     def get_session_info(self) -> Dict[str, Any]:
         """
         Get information about the current session.
@@ -243,11 +358,41 @@ class DatabaseConversationMemory:
         Returns:
             Dictionary with session information
         """
+        # If history hasn't been hydrated, a COUNT(*) is far cheaper than
+        # loading and converting the whole message window just to len() it
+        has_summary = bool(self._memory.moving_summary_buffer)
+        if self._history_loaded:
+            message_count = self._msg_count
+        else:
+            try:
+                with session_scope() as db:
+                    pair_count = db.execute(
+                        select(func.count())
+                        .select_from(ConversationHistory)
+                        .where(
+                            ConversationHistory.user_id == self.user_id,
+                            ConversationHistory.session_id == self.session_id
+                        )
+                    ).scalar_one()
+                    # The persisted summary is only restored at hydration,
+                    # so a cold status call has to look it up directly
+                    if not has_summary:
+                        has_summary = db.execute(
+                            select(func.count())
+                            .select_from(SessionSummary)
+                            .where(SessionSummary.session_id == self.session_id)
+                        ).scalar_one() > 0
+                # Each stored row holds a Human/AI message pair
+                message_count = pair_count * 2
+            except Exception as e:
+                logger.error(f"Error counting session messages: {e}")
+                message_count = 0
+
         return {
             "user_id": self.user_id,
             "session_id": self.session_id,
-            "message_count": len(self._memory.chat_memory.messages),
-            "has_summary": bool(self._memory.moving_summary_buffer)
+            "message_count": message_count,
+            "has_summary": has_summary
         }
     
     def clear_session(self) -> None:
@@ -255,31 +400,32 @@ class DatabaseConversationMemory:
         Clear current session memory (both in-memory and database).
         """
         try:
-            # Clear in-memory state
+            # Clear in-memory state; nothing is left to hydrate afterwards
             self._memory.clear()
+            self._history_loaded = True
+            self._msg_count = 0
             
-            # Clear database records for this session
-            db_gen = get_db()
-            db = next(db_gen)
+            # Make sure queued rows for this session land before the delete
+            flush_pending_writes()
             
-            db.query(ConversationHistory).filter(
-                and_(
-                    ConversationHistory.user_id == self.user_id,
-                    ConversationHistory.session_id == self.session_id
+            # Clear database records for this session
+            with session_scope() as db:
+                db.query(ConversationHistory).filter(
+                    and_(
+                        ConversationHistory.user_id == self.user_id,
+                        ConversationHistory.session_id == self.session_id
+                    )
+                ).delete()
+                db.execute(
+                    delete(SessionSummary).where(SessionSummary.session_id == self.session_id)
                 )
-            ).delete()
-            
-            db.commit()
+                db.commit()
+            self._persisted_summary = None
             
             logger.info(f"Cleared session {self.session_id} for user {self.user_id}")
             
         except Exception as e:
             logger.error(f"Error clearing session: {e}")
-            if 'db' in locals():
-                db.rollback()
-        finally:
-            if 'db' in locals():
-                db.close()
     
     def get_conversation_summary(self) -> str:
         """
@@ -303,31 +449,37 @@ class DatabaseConversationMemory:
         Returns:
             List of recent BaseMessage objects
         """
+        self._ensure_history_loaded()
         return self._memory.chat_memory.messages[-count:] if self._memory.chat_memory.messages else []
-    
+
     # === LangChain Memory Interface Methods ===
-    
+
     @property
     def chat_memory(self):
         """Delegate to internal memory's chat_memory."""
+        self._ensure_history_loaded()
         return self._memory.chat_memory
-    
+
     @property
     def moving_summary_buffer(self):
         """Delegate to internal memory's moving_summary_buffer."""
         return self._memory.moving_summary_buffer
-    
+
     def clear(self):
         """Clear the memory."""
         self._memory.clear()
-    
+        self._msg_count = 0
+
     def load_memory_variables(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
         """Load memory variables."""
+        self._ensure_history_loaded()
         return self._memory.load_memory_variables(inputs)
-    
-    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, str], 
+
+    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, str],
                     full_prompt_sent: str = None, llm_params: dict = None) -> None:
         """Save context to both internal memory and database with full tracking."""
+        # Hydrate first so the summarizer prunes over the real buffer
+        self._ensure_history_loaded()
         # Call internal memory method to update in-memory state
         self._memory.save_context(inputs, outputs)
         
@@ -338,6 +490,11 @@ class DatabaseConversationMemory:
         # Save to database with full tracking
         if human_message and ai_message:
             self._save_conversation_pair(human_message, ai_message, full_prompt_sent, llm_params)
+            # Every saved turn adds a Human/AI pair
+            self._msg_count += 2
+
+        # Persist the rolling summary if this turn's pruning changed it
+        self._maybe_persist_summary()
 
 # === Memory Factory Function ===
 
@@ -2,13 +2,21 @@
 
 import logging
 import os
+from functools import cache
 from config import LOG_LEVEL, LOG_FILE, LOG_FORMAT
 
+@cache
 def setup_logging():
     """
     Configure logging for the application.
     Creates log directory if it doesn't exist and sets up file and console logging.
+    Memoized so repeat calls (reimports, multiple entrypoints) don't stack
+    duplicate handlers on the root logger.
     """
+    # Short-circuit if something else already configured the root logger
+    if logging.getLogger().handlers:
+        return logging.getLogger(__name__)
+
     # Create log directory if it doesn't exist
     log_dir = os.path.dirname(LOG_FILE)
     if log_dir and not os.path.exists(log_dir):
@@ -1,6 +1,6 @@
 # === File: src/models.py ===
 
-from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, Boolean, Index, ForeignKey, DECIMAL
+from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, Boolean, Index, ForeignKey, DECIMAL, text
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from src.database import Base
@@ -24,7 +24,12 @@ class User(Base):
     user_facebook_accounts = relationship("UserFacebookAccount", foreign_keys="UserFacebookAccount.user_id", back_populates="user")
     conversations = relationship("ConversationHistory", back_populates="user")
     analysis_results = relationship("AnalysisResult", back_populates="user")
-    
+
+    # Partial index covering the login/verify lookup (email filtered by is_active)
+    __table_args__ = (
+        Index('ix_users_email_active', 'email', postgresql_where=text('is_active')),
+    )
+
     def __repr__(self):
         return f"<User(id={self.id}, email='{self.email}', name='{self.name}')>"
 
@@ -96,15 +101,34 @@ class ConversationHistory(Base):
     # Relationships
     user = relationship("User", back_populates="conversations")
     
-    # Indexes for performance
+    # Indexes for performance; the composite with timestamp serves the
+    # windowed history load (ORDER BY timestamp DESC LIMIT K per session)
     __table_args__ = (
         Index('idx_conversation_user_session', 'user_id', 'session_id'),
         Index('idx_conversation_timestamp', 'timestamp'),
+        Index('ix_conversation_user_session_ts', 'user_id', 'session_id', 'timestamp'),
     )
     
     def __repr__(self):
         return f"<ConversationHistory(id={self.id}, user_id='{self.user_id}', session_id='{self.session_id}')>"
 
+class SessionSummary(Base):
+    """
+    Model for persisting the rolling conversation summary of a session.
+    Lets a session resume after a process restart without re-running the
+    summarization LLM call over already-pruned history.
+    """
+    __tablename__ = "session_summaries"
+
+    session_id = Column(String(255), primary_key=True, comment="Conversation session identifier")
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True, comment="Foreign key to users table")
+    summary_text = Column(Text, nullable=False, comment="Rolling summary of pruned conversation turns")
+    summary_up_to_ts = Column(DateTime(timezone=True), comment="Timestamp the summary covers up to")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), comment="Summary last update timestamp")
+
+    def __repr__(self):
+        return f"<SessionSummary(session_id='{self.session_id}', user_id='{self.user_id}')>"
+
 class PromptVersion(Base):
     """
     Model for managing different versions of system prompts.
@@ -119,9 +143,11 @@ class PromptVersion(Base):
     is_active = Column(Boolean, default=False, comment="Whether this version is currently active")
     created_at = Column(DateTime(timezone=True), server_default=func.now(), comment="Version creation timestamp")
     
-    # Unique constraint for prompt_name + version combination
+    # Unique constraint for prompt_name + version combination, plus a
+    # partial index covering the active-prompt lookup on the chat path
     __table_args__ = (
         Index('idx_prompt_name_version', 'prompt_name', 'version', unique=True),
+        Index('ix_prompt_versions_active_name', 'prompt_name', postgresql_where=text('is_active')),
     )
     
     def __repr__(self):
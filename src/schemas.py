@@ -12,6 +12,8 @@ class HealthResponse(BaseModel):
     timestamp: datetime = Field(default_factory=datetime.now, description="Response timestamp")
     database_connected: bool = Field(description="Database connection status")
 
+    model_config = ConfigDict(frozen=True)
+
 # === User Schemas ===
 
 class UserBase(BaseModel):
@@ -30,14 +32,16 @@ class UserUpdate(BaseModel):
     password: Optional[str] = None
     is_active: Optional[bool] = None
 
-class UserResponse(UserBase):
-    """Schema for user response."""
+class UserResponse(BaseModel):
+    """Schema for user response. Deliberately excludes the password field."""
     id: int
+    email: str = Field(..., description="User email address")
+    name: Optional[str] = Field(None, description="User display name")
     is_active: bool
     created_at: datetime
     updated_at: datetime
     
-    model_config = ConfigDict(from_attributes=True)
+    model_config = ConfigDict(from_attributes=True, frozen=True)
 
 # === Authentication Schemas ===
 
@@ -45,6 +49,8 @@ class LoginRequest(BaseModel):
     """Schema for login request."""
     email: str = Field(..., description="User email address")
 
+    model_config = ConfigDict(str_strip_whitespace=True)
+
 class LoginResponse(BaseModel):
     """Schema for login response."""
     success: bool = Field(..., description="Whether login was successful")
@@ -52,6 +58,8 @@ class LoginResponse(BaseModel):
     user: Optional[UserResponse] = Field(None, description="User information if login successful")
     access_token: Optional[str] = Field(None, description="Access token for authenticated requests")
 
+    model_config = ConfigDict(frozen=True)
+
 # === Facebook Account Schemas ===
 
 class FacebookAccountBase(BaseModel):
@@ -139,6 +147,8 @@ class ChatRequest(BaseModel):
     message: str = Field(..., description="User message")
     session_id: Optional[str] = Field(None, description="Optional session identifier for conversation continuity")
 
+    model_config = ConfigDict(str_strip_whitespace=True)
+
 class ChatResponse(BaseModel):
     """Schema for chat endpoint response."""
     response: str = Field(..., description="AI agent response")
@@ -146,6 +156,8 @@ class ChatResponse(BaseModel):
     timestamp: datetime = Field(default_factory=datetime.now, description="Response timestamp")
     user_id: int = Field(..., description="User ID (foreign key to users table)")
 
+    model_config = ConfigDict(frozen=True)
+
 class SessionInfoResponse(BaseModel):
     """Schema for session information response."""
     user_id: int = Field(..., description="User ID (foreign key to users table)")
@@ -154,6 +166,8 @@ class SessionInfoResponse(BaseModel):
     has_summary: bool = Field(..., description="Whether session has conversation summary")
     created_at: Optional[datetime] = Field(None, description="Session creation timestamp")
 
+    model_config = ConfigDict(frozen=True)
+
 class ClearSessionRequest(BaseModel):
     """Schema for clearing session request."""
     user_id: str = Field(..., description="User identifier")
@@ -165,6 +179,8 @@ class ClearSessionResponse(BaseModel):
     message: str = Field(..., description="Operation result message")
     cleared_sessions: int = Field(..., description="Number of sessions cleared")
 
+    model_config = ConfigDict(frozen=True)
+
 # === Prompt Version Schemas ===
 
 class PromptVersionBase(BaseModel):
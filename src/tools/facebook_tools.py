@@ -3,9 +3,12 @@
 import pandas as pd
 import hashlib
 import traceback
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta
-from dateutil.relativedelta import relativedelta
-from typing import List, Dict, Any, Optional
+from threading import Lock
+from typing import Callable, List, Dict, Any, Optional
+
+from cachetools import TTLCache
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_
 
@@ -132,6 +135,10 @@ def get_campaign_data_for_period(ad_account_id, start_date, end_date):
         campaigns = ad_account.get_campaigns(fields=campaign_fields)
         extracted_data = []
 
+        # Period boundaries are constant for the whole loop; format them once
+        start_date_str = f"{start_date:%Y-%m-%d}"
+        end_date_str = f"{end_date:%Y-%m-%d}"
+
         for campaign in campaigns:
             campaign_name = campaign.get('name', '').lower()
 
@@ -158,8 +165,8 @@ def get_campaign_data_for_period(ad_account_id, start_date, end_date):
 
                 campaign_info = {
                     'Campaign ID': campaign.get('id'),
-                    'Inicio del informe': start_date.strftime('%Y-%m-%d'),
-                    'Fin del informe': end_date.strftime('%Y-%m-%d'),
+                    'Inicio del informe': start_date_str,
+                    'Fin del informe': end_date_str,
                     'Nombre de la campaña': campaign.get('name'),
                     'Objective': campaign.get('objective'),
                     'Entrega de la campaña': campaign.get('effective_status'),
@@ -241,9 +248,9 @@ def _calculate_date_ranges() -> tuple:
         tuple: (last_month_start, last_month_end, prev_month_start, prev_month_end)
     """
     today = datetime.today().date()
-    last_month_end = today.replace(day=1) - relativedelta(days=1)
+    last_month_end = today.replace(day=1) - timedelta(days=1)
     last_month_start = last_month_end.replace(day=1)
-    prev_month_end = last_month_start - relativedelta(days=1)
+    prev_month_end = last_month_start - timedelta(days=1)
     prev_month_start = prev_month_end.replace(day=1)
     
     return last_month_start, last_month_end, prev_month_start, prev_month_end
@@ -486,6 +493,73 @@ def _save_campaign_performance_data(ad_account_id: str, campaigns_data: List[Dic
         db.rollback()
         return False
 
+# === Tool Call Deduplication ===
+
+# The agent sometimes emits the same tool call twice in one turn (e.g.
+# two facebook_ads_analysis calls for the same account). Each duplicate
+# costs a full Graph API round-trip, which dominates tool latency, so
+# identical calls within a short window are served from this memo. The
+# in-flight map additionally collapses concurrent duplicates: the second
+# caller waits on the first call's Future instead of starting its own
+# API request.
+_tool_memo = TTLCache(maxsize=256, ttl=60)
+_tool_inflight: Dict[tuple, Future] = {}
+_tool_memo_lock = Lock()
+
+def _dedup_tool_call(tool_name: str, kwargs: Dict[str, Any], compute: Callable[[], str]) -> str:
+    """
+    Run a tool body at most once per (tool, arguments) within the memo
+    window; duplicate calls reuse the stored or in-flight result.
+
+    Args:
+        tool_name: Name of the tool being invoked
+        kwargs: The tool's keyword arguments (must be hashable values)
+        compute: Zero-argument callable running the real tool body
+
+    Returns:
+        The tool's string result
+    """
+    key = (tool_name, tuple(sorted(kwargs.items())))
+    with _tool_memo_lock:
+        cached = _tool_memo.get(key)
+        if cached is not None:
+            logger.info(f"Reusing recent result for duplicate {tool_name} call")
+            return cached
+        inflight = _tool_inflight.get(key)
+        if inflight is None:
+            inflight = Future()
+            _tool_inflight[key] = inflight
+            is_owner = True
+        else:
+            is_owner = False
+
+    if not is_owner:
+        logger.info(f"Waiting on in-flight {tool_name} call with identical arguments")
+        return inflight.result()
+
+    try:
+        result = compute()
+        with _tool_memo_lock:
+            # Error strings are not memoized so a transient failure
+            # doesn't shadow a successful retry for the whole window
+            if not result.startswith("Error"):
+                _tool_memo[key] = result
+        inflight.set_result(result)
+        return result
+    except BaseException as e:
+        inflight.set_exception(e)
+        raise
+    finally:
+        with _tool_memo_lock:
+            _tool_inflight.pop(key, None)
+
+def clear_tool_memo() -> None:
+    """
+    Drop all memoized tool results (e.g. after account assignments change).
+    """
+    with _tool_memo_lock:
+        _tool_memo.clear()
+
 # === LangChain Tools ===
 
 class ListAvailableClientsTool(BaseTool):
@@ -498,14 +572,21 @@ class ListAvailableClientsTool(BaseTool):
     
     def _run(self, user_id: int) -> str:
         """
-        Execute the tool to list available clients.
-        
+        Execute the tool to list available clients, deduplicating
+        identical calls within the memo window.
+
         Args:
             user_id: User ID (foreign key to users table)
-        
+
         Returns:
             String representation of available accounts
         """
+        return _dedup_tool_call(self.name, {"user_id": user_id}, lambda: self._run_uncached(user_id))
+
+    def _run_uncached(self, user_id: int) -> str:
+        """
+        Real tool body: query and format the user's accounts.
+        """
         try:
             # Get database session
             db_gen = get_db()
@@ -560,15 +641,26 @@ class FacebookAdsAnalysisTool(BaseTool):
     
     def _run(self, ad_account_id: str, campaign_type: str = "lead_form") -> str:
         """
-        Execute the tool to analyze Facebook ads data.
-        
+        Execute the tool to analyze Facebook ads data, deduplicating
+        identical calls within the memo window.
+
         Args:
             ad_account_id: Facebook Ad Account ID (e.g., act_123456)
             campaign_type: Type of campaigns to analyze (default: "lead_form")
-        
+
         Returns:
             String representation of analysis results
         """
+        return _dedup_tool_call(
+            self.name,
+            {"ad_account_id": ad_account_id, "campaign_type": campaign_type},
+            lambda: self._run_uncached(ad_account_id, campaign_type)
+        )
+
+    def _run_uncached(self, ad_account_id: str, campaign_type: str = "lead_form") -> str:
+        """
+        Real tool body: fetch, filter, cache and summarize campaign data.
+        """
         try:
             # Get database session
             db_gen = get_db()
@@ -584,49 +676,66 @@ class FacebookAdsAnalysisTool(BaseTool):
             last_month_cached = _get_cached_data(ad_account_id, campaign_type, last_month_start, last_month_end, db)
             prev_month_cached = _get_cached_data(ad_account_id, campaign_type, prev_month_start, prev_month_end, db)
             
-            # Get data for last month
-            if last_month_cached:
-                df_last_month = pd.DataFrame(last_month_cached)
-                logger.info("Using cached data for last month")
-            else:
-                logger.info("Fetching fresh data for last month from Facebook API")
-                df_last_month = get_campaign_data_for_period(ad_account_id, last_month_start, last_month_end)
-                
-                # Filter by campaign type
-                if not df_last_month.empty:
-                    # Convert DataFrame to list of dicts for filtering
-                    campaigns_list = df_last_month.to_dict('records')
-                    filtered_campaigns = _filter_campaigns_by_type(campaigns_list, campaign_type)
-                    df_last_month = pd.DataFrame(filtered_campaigns) if filtered_campaigns else pd.DataFrame()
-                
-                # Save to cache and detailed performance data
-                if not df_last_month.empty:
-                    campaigns_data = df_last_month.to_dict('records')
-                    _save_to_cache(ad_account_id, campaign_type, last_month_start, last_month_end, campaigns_data, db)
-                    # Also save detailed campaign performance data
-                    _save_campaign_performance_data(ad_account_id, campaigns_data, db)
-            
-            # Get data for previous month
-            if prev_month_cached:
-                df_prev_month = pd.DataFrame(prev_month_cached)
-                logger.info("Using cached data for previous month")
-            else:
-                logger.info("Fetching fresh data for previous month from Facebook API")
-                df_prev_month = get_campaign_data_for_period(ad_account_id, prev_month_start, prev_month_end)
+            # Fetch any uncached periods concurrently - the two Graph API
+            # calls are independent, so overlapping them halves wall-clock time
+            last_month_future = None
+            prev_month_future = None
+            executor = ThreadPoolExecutor(max_workers=2)
+            try:
+                if not last_month_cached:
+                    logger.info("Fetching fresh data for last month from Facebook API")
+                    last_month_future = executor.submit(
+                        get_campaign_data_for_period, ad_account_id, last_month_start, last_month_end
+                    )
+                if not prev_month_cached:
+                    logger.info("Fetching fresh data for previous month from Facebook API")
+                    prev_month_future = executor.submit(
+                        get_campaign_data_for_period, ad_account_id, prev_month_start, prev_month_end
+                    )
                 
-                # Filter by campaign type
-                if not df_prev_month.empty:
-                    # Convert DataFrame to list of dicts for filtering
-                    campaigns_list = df_prev_month.to_dict('records')
-                    filtered_campaigns = _filter_campaigns_by_type(campaigns_list, campaign_type)
-                    df_prev_month = pd.DataFrame(filtered_campaigns) if filtered_campaigns else pd.DataFrame()
+                # Get data for last month
+                if last_month_cached:
+                    df_last_month = pd.DataFrame(last_month_cached)
+                    logger.info("Using cached data for last month")
+                else:
+                    df_last_month = last_month_future.result()
+                    
+                    # Filter by campaign type
+                    if not df_last_month.empty:
+                        # Convert DataFrame to list of dicts for filtering
+                        campaigns_list = df_last_month.to_dict('records')
+                        filtered_campaigns = _filter_campaigns_by_type(campaigns_list, campaign_type)
+                        df_last_month = pd.DataFrame(filtered_campaigns) if filtered_campaigns else pd.DataFrame()
+                    
+                    # Save to cache and detailed performance data
+                    if not df_last_month.empty:
+                        campaigns_data = df_last_month.to_dict('records')
+                        _save_to_cache(ad_account_id, campaign_type, last_month_start, last_month_end, campaigns_data, db)
+                        # Also save detailed campaign performance data
+                        _save_campaign_performance_data(ad_account_id, campaigns_data, db)
                 
-                # Save to cache and detailed performance data
-                if not df_prev_month.empty:
-                    campaigns_data = df_prev_month.to_dict('records')
-                    _save_to_cache(ad_account_id, campaign_type, prev_month_start, prev_month_end, campaigns_data, db)
-                    # Also save detailed campaign performance data
-                    _save_campaign_performance_data(ad_account_id, campaigns_data, db)
+                # Get data for previous month
+                if prev_month_cached:
+                    df_prev_month = pd.DataFrame(prev_month_cached)
+                    logger.info("Using cached data for previous month")
+                else:
+                    df_prev_month = prev_month_future.result()
+                    
+                    # Filter by campaign type
+                    if not df_prev_month.empty:
+                        # Convert DataFrame to list of dicts for filtering
+                        campaigns_list = df_prev_month.to_dict('records')
+                        filtered_campaigns = _filter_campaigns_by_type(campaigns_list, campaign_type)
+                        df_prev_month = pd.DataFrame(filtered_campaigns) if filtered_campaigns else pd.DataFrame()
+                    
+                    # Save to cache and detailed performance data
+                    if not df_prev_month.empty:
+                        campaigns_data = df_prev_month.to_dict('records')
+                        _save_to_cache(ad_account_id, campaign_type, prev_month_start, prev_month_end, campaigns_data, db)
+                        # Also save detailed campaign performance data
+                        _save_campaign_performance_data(ad_account_id, campaigns_data, db)
+            finally:
+                executor.shutdown(wait=False)
             
             # Prepare response
             if df_last_month.empty and df_prev_month.empty:
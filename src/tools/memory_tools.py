@@ -0,0 +1,78 @@
+# === File: src/tools/memory_tools.py ===
+
+from sqlalchemy import select
+
+from langchain.tools import BaseTool
+from pydantic import BaseModel, Field
+
+from src.database import session_scope
+from src.models import SessionSummary
+from src.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# === Input Schemas for Tools ===
+
+class PreviousSessionsInput(BaseModel):
+    """Input schema for previous_sessions_summary_tool."""
+    user_id: int = Field(..., description="User ID (foreign key to users table)")
+
+# === LangChain Tools ===
+
+class PreviousSessionsSummaryTool(BaseTool):
+    """
+    Tool to retrieve summaries of a user's previous conversation sessions.
+    Past-session context is fetched on demand through this tool instead of
+    being prepended to every prompt, so its tokens are only paid on the
+    turns that actually need it.
+    """
+    name: str = "previous_sessions_summary"
+    description: str = (
+        "Get summaries of the user's previous conversation sessions. "
+        "Use this only when the user refers to something discussed in an earlier conversation."
+    )
+    args_schema: type = PreviousSessionsInput
+
+    def _run(self, user_id: int) -> str:
+        """
+        Execute the tool to retrieve previous session summaries.
+
+        Args:
+            user_id: User ID (foreign key to users table)
+
+        Returns:
+            String with the most recent session summaries
+        """
+        try:
+            with session_scope() as db:
+                # Only the summary text and its timestamp — no ORM hydration
+                summaries = db.execute(
+                    select(SessionSummary.summary_text, SessionSummary.updated_at)
+                    .where(SessionSummary.user_id == user_id)
+                    .order_by(SessionSummary.updated_at.desc())
+                    .limit(3)
+                ).all()
+
+            if not summaries:
+                return f"No previous conversation summaries found for user {user_id}."
+
+            parts = []
+            for i, (summary_text, updated_at) in enumerate(summaries, 1):
+                when = updated_at.strftime("%Y-%m-%d") if updated_at else "unknown date"
+                parts.append(f"{i}. ({when}) {summary_text}")
+
+            logger.info(f"Retrieved {len(summaries)} previous session summaries for user {user_id}")
+            return "Summaries of previous conversations:\n\n" + "\n\n".join(parts)
+
+        except Exception as e:
+            logger.error(f"Error retrieving previous session summaries: {e}")
+            return f"Error retrieving previous session summaries for user {user_id}: {str(e)}"
+
+# === Tool Instances ===
+
+previous_sessions_summary_tool = PreviousSessionsSummaryTool()
+
+__all__ = [
+    "PreviousSessionsSummaryTool",
+    "previous_sessions_summary_tool"
+]
@@ -3,15 +3,23 @@
 from decimal import Decimal
 from datetime import datetime
 from typing import Optional, Dict, Any
+from cachetools import TTLCache
 from sqlalchemy.orm import Session
 from sqlalchemy import and_
 
-from src.database import get_db
+from src.database import session_scope
 from src.models import ModelPricing, ModelMapping
 from src.logging_config import get_logger
 
 logger = get_logger(__name__)
 
+# Model mappings and pricing change rarely but are looked up on every
+# processed message (twice per conversation turn). A short TTL cache
+# removes those per-message SELECTs while still picking up admin updates
+# within the hour.
+_mapping_cache = TTLCache(maxsize=64, ttl=3600)
+_pricing_cache = TTLCache(maxsize=64, ttl=3600)
+
 class CostCalculator:
     """
     Utility class for calculating LLM usage costs based on token consumption.
@@ -28,31 +36,32 @@ class CostCalculator:
         Returns:
             Generic model name for pricing lookup, or the original name if no mapping found
         """
+        cached = _mapping_cache.get(assigned_model_name)
+        if cached is not None:
+            return cached
+        
         try:
-            db_gen = get_db()
-            db = next(db_gen)
-            
-            # Look for active mapping
-            mapping = db.query(ModelMapping).filter(
-                and_(
-                    ModelMapping.assigned_model_name == assigned_model_name,
-                    ModelMapping.is_active == True
-                )
-            ).first()
+            with session_scope() as db:
+                # Look for active mapping
+                mapping = db.query(ModelMapping).filter(
+                    and_(
+                        ModelMapping.assigned_model_name == assigned_model_name,
+                        ModelMapping.is_active == True
+                    )
+                ).first()
+                
+                if mapping:
+                    logger.info(f"Mapped {assigned_model_name} -> {mapping.generic_model_name}")
+                    _mapping_cache[assigned_model_name] = mapping.generic_model_name
+                    return mapping.generic_model_name
             
-            if mapping:
-                logger.info(f"Mapped {assigned_model_name} -> {mapping.generic_model_name}")
-                return mapping.generic_model_name
-            else:
-                logger.warning(f"No mapping found for {assigned_model_name}, using original name")
-                return assigned_model_name
+            logger.warning(f"No mapping found for {assigned_model_name}, using original name")
+            _mapping_cache[assigned_model_name] = assigned_model_name
+            return assigned_model_name
                 
         except Exception as e:
             logger.error(f"Error getting generic model name: {e}")
             return assigned_model_name
-        finally:
-            if 'db' in locals():
-                db.close()
     
     @staticmethod
     def get_model_pricing(model_name: str, effective_date: Optional[datetime] = None) -> Optional[Dict[str, Decimal]]:
@@ -66,45 +75,47 @@ class CostCalculator:
         Returns:
             Dictionary with input_cost_per_1k_tokens and output_cost_per_1k_tokens, or None if not found
         """
+        if effective_date is None:
+            effective_date = datetime.now().date()
+        
+        cache_key = (model_name, effective_date)
+        cached = _pricing_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
-            db_gen = get_db()
-            db = next(db_gen)
-            
-            if effective_date is None:
-                effective_date = datetime.now().date()
-            
-            # Try to get specific model pricing first
-            pricing = db.query(ModelPricing).filter(
-                and_(
-                    ModelPricing.model_name == model_name,
-                    ModelPricing.effective_date <= effective_date
-                )
-            ).order_by(ModelPricing.effective_date.desc()).first()
-            
-            # If not found, try default pricing
-            if not pricing:
+            with session_scope() as db:
+                # Try to get specific model pricing first
                 pricing = db.query(ModelPricing).filter(
                     and_(
-                        ModelPricing.model_name == 'default',
+                        ModelPricing.model_name == model_name,
                         ModelPricing.effective_date <= effective_date
                     )
                 ).order_by(ModelPricing.effective_date.desc()).first()
-            
-            if pricing:
-                return {
-                    'input_cost_per_1k_tokens': pricing.input_cost_per_1k_tokens,
-                    'output_cost_per_1k_tokens': pricing.output_cost_per_1k_tokens
-                }
-            else:
-                logger.warning(f"No pricing found for model {model_name}")
-                return None
+                
+                # If not found, try default pricing
+                if not pricing:
+                    pricing = db.query(ModelPricing).filter(
+                        and_(
+                            ModelPricing.model_name == 'default',
+                            ModelPricing.effective_date <= effective_date
+                        )
+                    ).order_by(ModelPricing.effective_date.desc()).first()
+                
+                if pricing:
+                    result = {
+                        'input_cost_per_1k_tokens': pricing.input_cost_per_1k_tokens,
+                        'output_cost_per_1k_tokens': pricing.output_cost_per_1k_tokens
+                    }
+                    _pricing_cache[cache_key] = result
+                    return result
+            
+            logger.warning(f"No pricing found for model {model_name}")
+            return None
                 
         except Exception as e:
             logger.error(f"Error getting model pricing: {e}")
             return None
-        finally:
-            if 'db' in locals():
-                db.close()
     
     @staticmethod
     def calculate_cost(
@@ -14,6 +14,7 @@ EXPECTED_COLUMNS = {
     'campaign_performance_data': ['id', 'ad_account_id', 'campaign_id', 'campaign_name', 'date', 'metrics', 'facebook_account_id', 'created_at'],
     'model_pricing': ['id', 'model_name', 'input_cost_per_1k_tokens', 'output_cost_per_1k_tokens', 'effective_date', 'created_at', 'updated_at'],
     'analysis_results': ['id', 'user_id', 'session_id', 'analysis_type', 'facebook_account_id', 'result_text', 'analysis_metadata', 'created_at'],
+    'session_summaries': ['session_id', 'user_id', 'summary_text', 'summary_up_to_ts', 'updated_at'],
 }
 
 
@@ -28,8 +29,11 @@ def test_tables_exist_and_columns_match():
     missing_tables = [t for t in EXPECTED_COLUMNS if t not in existing_tables]
     assert not missing_tables, f"Missing tables: {missing_tables}"
 
+    # One bulk catalog round-trip for every table instead of one per table
+    all_columns = insp.get_multi_columns(filter_names=list(EXPECTED_COLUMNS))
+
     for table_name, expected_cols in EXPECTED_COLUMNS.items():
-        cols = [c['name'] for c in insp.get_columns(table_name)]
+        cols = [c['name'] for c in all_columns[(None, table_name)]]
         missing_cols = sorted(set(expected_cols) - set(cols))
         extra_cols = sorted(set(cols) - set(expected_cols))
         assert not missing_cols, f"{table_name} missing columns: {missing_cols}"
@@ -19,27 +19,33 @@ def test_expected_foreign_keys_exist_postgres():
     if not check_connection():
         pytest.skip("Database not reachable in this environment")
     if engine.dialect.name != 'postgresql':
-        pytest.skip("FK check uses information_schema; skipping for non-PostgreSQL")
+        pytest.skip("FK check uses pg_catalog; skipping for non-PostgreSQL")
 
     db = SessionLocal()
     try:
+        # pg_catalog instead of the information_schema views: the three-way
+        # view join plans as implicit full catalog scans, while pg_constraint
+        # resolves through index lookups on conrelid/confrelid.
         result = db.execute(text(
             """
-            SELECT 
-                tc.table_name,
-                kcu.column_name,
-                ccu.table_name AS foreign_table_name,
-                ccu.column_name AS foreign_column_name
-            FROM information_schema.table_constraints AS tc 
-            JOIN information_schema.key_column_usage AS kcu
-                ON tc.constraint_name = kcu.constraint_name
-                AND tc.table_schema = kcu.table_schema
-            JOIN information_schema.constraint_column_usage AS ccu
-                ON ccu.constraint_name = tc.constraint_name
-                AND ccu.table_schema = tc.table_schema
-            WHERE tc.constraint_type = 'FOREIGN KEY' 
-                AND tc.table_schema = 'public'
-            ORDER BY tc.table_name, kcu.column_name
+            SELECT
+                src.relname AS table_name,
+                att.attname AS column_name,
+                ref.relname AS foreign_table_name,
+                fatt.attname AS foreign_column_name
+            FROM pg_constraint con
+            JOIN pg_class src ON src.oid = con.conrelid
+            JOIN pg_class ref ON ref.oid = con.confrelid
+            JOIN pg_namespace nsp ON nsp.oid = con.connamespace
+            JOIN pg_attribute att
+                ON att.attrelid = con.conrelid
+                AND att.attnum = ANY(con.conkey)
+            JOIN pg_attribute fatt
+                ON fatt.attrelid = con.confrelid
+                AND fatt.attnum = ANY(con.confkey)
+            WHERE con.contype = 'f'
+                AND nsp.nspname = 'public'
+            ORDER BY src.relname, att.attname
             """
         ))
         existing = {(r.table_name, r.column_name, r.foreign_table_name, r.foreign_column_name) for r in result.fetchall()}
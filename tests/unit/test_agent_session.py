@@ -66,9 +66,9 @@ def test_persistent_session_id_monkeypatch(monkeypatch):
         raising=True,
     )
 
-    # Also mock ConversationSummaryBufferMemory to avoid Pydantic validation
+    # Also mock the summary memory class to avoid Pydantic validation
     from unittest.mock import patch
-    with patch('src.agent.memory.ConversationSummaryBufferMemory'):
+    with patch('src.agent.memory._TokenCachingSummaryMemory'):
         agent1 = DigitalMarketingAgent(user_id=1)
         agent2 = DigitalMarketingAgent(user_id=1)
         agent3 = DigitalMarketingAgent(user_id=2)
@@ -0,0 +1,43 @@
+import pytest
+from unittest.mock import MagicMock
+from fastapi import HTTPException
+
+import main
+
+@pytest.fixture
+def mock_user():
+    """Fixture to create a mock user row."""
+    user = MagicMock()
+    user.id = 1
+    user.email = "test@example.com"
+    return user
+
+# 32-byte keys keep PyJWT's HMAC key-length check quiet
+_TEST_KEY = b"t" * 32
+_OTHER_KEY = b"o" * 32
+
+def test_access_token_round_trip(monkeypatch, mock_user):
+    """Test that a freshly issued token validates locally."""
+    monkeypatch.setattr(main, "_JWT_KEY", _TEST_KEY)
+    token = main._create_access_token(mock_user)
+    payload = main.decode_access_token(token)
+    assert payload["sub"] == "1"
+    assert payload["email"] == "test@example.com"
+    assert payload["exp"] > 0
+
+def test_decode_rejects_token_signed_with_other_key(monkeypatch, mock_user):
+    """Test that a token signed with a different key is rejected with 401."""
+    monkeypatch.setattr(main, "_JWT_KEY", _OTHER_KEY)
+    token = main._create_access_token(mock_user)
+    monkeypatch.setattr(main, "_JWT_KEY", _TEST_KEY)
+    with pytest.raises(HTTPException) as exc_info:
+        main.decode_access_token(token)
+    assert exc_info.value.status_code == 401
+
+def test_legacy_token_without_signing_key(monkeypatch, mock_user):
+    """Test the fallback paths when no signing key is configured."""
+    monkeypatch.setattr(main, "_JWT_KEY", None)
+    assert main._create_access_token(mock_user) == "user_1_test@example.com"
+    with pytest.raises(HTTPException) as exc_info:
+        main.decode_access_token("user_1_test@example.com")
+    assert exc_info.value.status_code == 401
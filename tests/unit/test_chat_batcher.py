@@ -0,0 +1,53 @@
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+
+from main import ChatBatcher
+
+def test_batcher_resolves_submissions_in_order():
+    """Test that submitted messages get their own agent's response back."""
+    async def scenario():
+        batcher = ChatBatcher(max_batch=4)
+        batcher.start()
+        agent = MagicMock()
+        agent.process_message.side_effect = lambda message: f"echo: {message}"
+        try:
+            return await asyncio.gather(
+                batcher.submit(agent, "primera"),
+                batcher.submit(agent, "segunda"),
+            )
+        finally:
+            await batcher.stop()
+
+    assert asyncio.run(scenario()) == ["echo: primera", "echo: segunda"]
+
+def test_batcher_propagates_agent_exceptions():
+    """Test that an agent failure surfaces on the caller's future only."""
+    async def scenario():
+        batcher = ChatBatcher(max_batch=4)
+        batcher.start()
+        agent = MagicMock()
+        agent.process_message.side_effect = ValueError("boom")
+        try:
+            with pytest.raises(ValueError, match="boom"):
+                await batcher.submit(agent, "hola")
+        finally:
+            await batcher.stop()
+
+    asyncio.run(scenario())
+
+def test_batcher_window_widens_under_saturation():
+    """Test that the collection window grows past its floor under a burst."""
+    async def scenario():
+        batcher = ChatBatcher(max_batch=2, min_wait_ms=2.0, max_wait_ms=25.0)
+        batcher.start()
+        agent = MagicMock()
+        agent.process_message.side_effect = lambda message: message
+        try:
+            await asyncio.gather(*[batcher.submit(agent, f"m{i}") for i in range(6)])
+            return batcher._wait
+        finally:
+            await batcher.stop()
+
+    assert asyncio.run(scenario()) > 2.0 / 1000.0
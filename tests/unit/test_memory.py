@@ -1,6 +1,6 @@
 import pytest
 from unittest.mock import MagicMock, patch
-from src.agent.memory import DatabaseConversationMemory, create_memory
+from src.agent.memory import DatabaseConversationMemory, create_memory, flush_pending_writes
 
 @pytest.fixture
 def mock_db_session():
@@ -12,10 +12,10 @@ def mock_db_session():
 
 @pytest.fixture
 def mock_get_db(mock_db_session):
-    """Fixture to patch get_db to return the mock_db_session repeatedly."""
-    with patch('src.agent.memory.get_db') as mock_get_db:
-        mock_get_db.side_effect = lambda: iter([mock_db_session])
-        yield mock_get_db
+    """Fixture to patch session_scope to yield the mock_db_session."""
+    with patch('src.agent.memory.session_scope') as mock_session_scope:
+        mock_session_scope.return_value.__enter__.return_value = mock_db_session
+        yield mock_session_scope
 
 @pytest.fixture
 def mock_llm():
@@ -24,31 +24,31 @@ def mock_llm():
 
 def test_create_memory(mock_get_db, mock_llm):
     """Test the create_memory factory function."""
-    with patch('src.agent.memory.ConversationSummaryBufferMemory'):
+    with patch('src.agent.memory._TokenCachingSummaryMemory'):
         memory = create_memory(user_id=1, session_id="test_session", llm=mock_llm)
         assert isinstance(memory, DatabaseConversationMemory)
         assert memory.user_id == 1
         assert memory.session_id == "test_session"
 
 def test_database_conversation_memory_init(mock_get_db, mock_llm):
-    """Test the initialization of DatabaseConversationMemory."""
-    with patch('src.agent.memory.ConversationSummaryBufferMemory'):
+    """Test that initialization defers history loading until first use."""
+    with patch('src.agent.memory._TokenCachingSummaryMemory'):
         with patch.object(DatabaseConversationMemory, '_load_conversation_history') as mock_load_history:
-            with patch.object(DatabaseConversationMemory, '_load_long_term_memory') as mock_load_long_term_memory:
-                memory = DatabaseConversationMemory(user_id=1, session_id="test_session", llm=mock_llm)
-                assert memory.user_id == 1
-                assert memory.session_id == "test_session"
-                mock_load_history.assert_called_once()
-                mock_load_long_term_memory.assert_called_once()
+            memory = DatabaseConversationMemory(user_id=1, session_id="test_session", llm=mock_llm)
+            assert memory.user_id == 1
+            assert memory.session_id == "test_session"
+            # Construction alone must not touch the database
+            mock_load_history.assert_not_called()
+            # First consumer access hydrates exactly once
+            memory.load_memory_variables({})
+            memory.load_memory_variables({})
+            mock_load_history.assert_called_once()
 
 def test_load_conversation_history(mock_db_session, mock_get_db, mock_llm):
     """Test loading conversation history from the database."""
-    mock_conversation = MagicMock()
-    mock_conversation.user_prompt = "Hello"
-    mock_conversation.llm_response = "Hi"
-    mock_db_session.query.return_value.filter.return_value.order_by.return_value.all.return_value = [mock_conversation]
+    mock_db_session.execute.return_value.all.return_value = [("Hello", "Hi")]
 
-    with patch('src.agent.memory.ConversationSummaryBufferMemory'):
+    with patch('src.agent.memory._TokenCachingSummaryMemory'):
         memory = DatabaseConversationMemory(user_id=1, session_id="test_session", llm=mock_llm)
         # Manually trigger loading for assertion since __init__ is complex
         memory._memory.chat_memory.messages = []
@@ -58,18 +58,48 @@ def test_load_conversation_history(mock_db_session, mock_get_db, mock_llm):
 
 def test_save_conversation_pair(mock_db_session, mock_get_db, mock_llm):
     """Test saving a conversation pair to the database."""
-    with patch('src.agent.memory.ConversationSummaryBufferMemory'):
+    with patch('src.agent.memory._TokenCachingSummaryMemory'):
         with patch('src.agent.memory.CostCalculator') as mock_cost_calculator:
             mock_cost_calculator.estimate_tokens_from_text.return_value = 10
             mock_cost_calculator.calculate_cost.return_value = 0.001
             memory = DatabaseConversationMemory(user_id=1, session_id="test_session", llm=mock_llm)
             memory._save_conversation_pair("Hello", "Hi", "Full prompt", {"model_name": "test_model"})
-            mock_db_session.add.assert_called_once()
+            flush_pending_writes()
+            # The writer persists the batch with one Core multi-row INSERT
+            mock_db_session.execute.assert_called_once()
             mock_db_session.commit.assert_called_once()
 
+def test_load_restores_persisted_summary(mock_db_session, mock_get_db, mock_llm):
+    """Test that hydration restores the summary persisted for the session."""
+    summary_result = MagicMock()
+    summary_result.scalar_one_or_none.return_value = "resumen anterior"
+    history_result = MagicMock()
+    history_result.all.return_value = []
+    count_result = MagicMock()
+    count_result.scalar_one.return_value = 0
+    mock_db_session.execute.side_effect = [summary_result, history_result, count_result]
+
+    with patch('src.agent.memory._TokenCachingSummaryMemory'):
+        memory = DatabaseConversationMemory(user_id=1, session_id="test_session", llm=mock_llm)
+        memory._load_conversation_history()
+        assert memory._memory.moving_summary_buffer == "resumen anterior"
+        assert memory._persisted_summary == "resumen anterior"
+
+def test_maybe_persist_summary_upserts_only_on_change(mock_db_session, mock_get_db, mock_llm):
+    """Test that the rolling summary is upserted once per change."""
+    with patch('src.agent.memory._TokenCachingSummaryMemory'):
+        memory = DatabaseConversationMemory(user_id=1, session_id="test_session", llm=mock_llm)
+        memory._memory.moving_summary_buffer = "resumen"
+        memory._maybe_persist_summary()
+        mock_db_session.merge.assert_called_once()
+        mock_db_session.commit.assert_called_once()
+        # Unchanged summary: no second write
+        memory._maybe_persist_summary()
+        mock_db_session.merge.assert_called_once()
+
 def test_clear_session(mock_db_session, mock_get_db, mock_llm):
     """Test clearing the session from memory and database."""
-    with patch('src.agent.memory.ConversationSummaryBufferMemory'):
+    with patch('src.agent.memory._TokenCachingSummaryMemory'):
         memory = DatabaseConversationMemory(user_id=1, session_id="test_session", llm=mock_llm)
         memory.clear_session()
         mock_db_session.query.return_value.filter.return_value.delete.assert_called_once()
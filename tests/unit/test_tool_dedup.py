@@ -0,0 +1,31 @@
+import pytest
+from unittest.mock import MagicMock
+
+from src.tools.facebook_tools import _dedup_tool_call, clear_tool_memo
+
+@pytest.fixture(autouse=True)
+def clean_memo():
+    """Start and finish every test with an empty tool memo."""
+    clear_tool_memo()
+    yield
+    clear_tool_memo()
+
+def test_dedup_reuses_recent_result():
+    """Test that a repeated call with identical arguments skips the tool body."""
+    compute = MagicMock(return_value="analysis result")
+    assert _dedup_tool_call("analysis", {"user_id": 1}, compute) == "analysis result"
+    assert _dedup_tool_call("analysis", {"user_id": 1}, compute) == "analysis result"
+    compute.assert_called_once()
+
+def test_dedup_distinguishes_arguments():
+    """Test that different arguments run the tool body separately."""
+    compute = MagicMock(side_effect=["first", "second"])
+    assert _dedup_tool_call("analysis", {"user_id": 1}, compute) == "first"
+    assert _dedup_tool_call("analysis", {"user_id": 2}, compute) == "second"
+    assert compute.call_count == 2
+
+def test_dedup_does_not_memoize_errors():
+    """Test that error results are not memoized, so a retry can succeed."""
+    compute = MagicMock(side_effect=["Error: upstream timeout", "recovered"])
+    assert _dedup_tool_call("analysis", {"user_id": 1}, compute) == "Error: upstream timeout"
+    assert _dedup_tool_call("analysis", {"user_id": 1}, compute) == "recovered"
@@ -0,0 +1,32 @@
+import pytest
+
+from src.agent.agent_executor import _classify_trivial
+
+@pytest.mark.parametrize("message,expected", [
+    ("hola", 'greeting'),
+    ("Hola!", 'greeting'),
+    ("buenos días", 'greeting'),
+    ("Buenas tardes", 'greeting'),
+    ("hello", 'greeting'),
+    ("gracias", 'thanks'),
+    ("Muchas gracias!!", 'thanks'),
+    ("thank you", 'thanks'),
+    ("ok", 'ack'),
+    ("vale", 'ack'),
+    ("de acuerdo", 'ack'),
+    ("Perfecto.", 'ack'),
+])
+def test_classify_trivial_matches(message, expected):
+    """Test that short greetings, thanks and acknowledgements are classified."""
+    assert _classify_trivial(message) == expected
+
+@pytest.mark.parametrize("message", [
+    "hola, ¿cómo van mis campañas?",
+    "gracias por el análisis, ahora muestra los resultados de la otra cuenta",
+    "analiza la cuenta act_12345",
+    "ok " * 20,  # over the length cap
+    "",
+])
+def test_classify_trivial_passes_real_content(message):
+    """Test that messages with real content fall through to the agent."""
+    assert _classify_trivial(message) is None